@@ -0,0 +1,114 @@
+"""Payload size and memory of encoding uploaded images.
+
+Usage:
+    python -m benchmarks.images
+
+Each case is encoded in a fresh process, so the peak RSS increase reflects the
+decode and recompress of that image alone. JPEGs are also measured without
+reduced-scale decoding (`draft`) for comparison.
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image, JpegImagePlugin
+
+CASES = {
+    "phone photo 4032x3024 JPEG": ((4032, 3024), "JPEG"),
+    "A4 scan 2480x3508 PNG": ((2480, 3508), "PNG"),
+    "screenshot 2560x1600 PNG": ((2560, 1600), "PNG"),
+}
+
+
+def make_image(size: tuple[int, int], fmt: str) -> bytes:
+    """Builds a deterministic image with gradients and noise, like a real photo."""
+
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 24)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(0)))
+    data = io.BytesIO()
+    image.save(data, fmt, **({"quality": 92} if fmt == "JPEG" else {}))
+    return data.getvalue()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    """Resident memory right now, Linux only."""
+
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmRSS not found")
+
+
+def run_child(path: str, draft: bool) -> dict:
+    from src.utils.images import encode_image, get_image_payload
+
+    if not draft:
+        JpegImagePlugin.JpegImageFile.draft = lambda self, mode, size: None
+
+    with open(path, "rb") as f:
+        upload = io.BytesIO(f.read())
+    rss_before = current_rss_mb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    ref = encode_image(upload)
+    elapsed = time.perf_counter() - started
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    input_bytes = len(upload.getbuffer())
+    payload_bytes = len(get_image_payload(ref))
+    return {
+        "input_bytes": input_bytes,
+        "raw_data_url_bytes": len(base64.b64encode(upload.getbuffer())) + 23,
+        "payload_bytes": payload_bytes,
+        "reduction": round(1 - payload_bytes / (input_bytes * 4 / 3), 3),
+        "encode_ms": round(elapsed * 1000, 1),
+        "peak_rss_increase_mb": round(peak_rss_mb() - rss_before, 1),
+        "python_peak_mb": round(python_peak / 2**20, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--no-draft", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, draft=not args.no_draft)))
+        return
+
+    env = {"PROMPTLAYER_API_KEY": "benchmark", **os.environ}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (size, fmt) in CASES.items():
+            path = os.path.join(tmp, f"input.{fmt.lower()}")
+            with open(path, "wb") as f:
+                f.write(make_image(size, fmt))
+            for draft in (True, False) if fmt == "JPEG" else (True,):
+                command = [sys.executable, "-m", "benchmarks.images", "--child", path]
+                if not draft:
+                    command.append("--no-draft")
+                output = subprocess.run(
+                    command, env=env, capture_output=True, text=True, check=True
+                ).stdout
+                row = {"case": name, "draft": draft, **json.loads(output)}
+                print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Prompt size and latency of a 300-field form, collected whole vs by section.
+
+Usage:
+    python -m benchmarks.sections [--fields 300] [--turns 50] [--live]
+
+Offline it measures the per-turn prompt size and the local cost of building the
+form details, tool schema and validator. With --live (requires OPENAI_API_KEY)
+it also streams one request per layout and reports time to first token.
+"""
+
+import argparse
+import json
+import os
+import time
+from statistics import median
+
+from src.core.config import settings
+from src.models.agent import Agent, FormField
+from src.utils import utils
+from src.utils.constants import FIELD_TYPES_MAPPER
+from src.utils.utils import (
+    get_canonical_tool,
+    get_form_model,
+    get_section_model,
+    model_fields_to_string,
+    resolve_sections,
+    validate_form_values,
+)
+
+FIELD_TYPES = list(FIELD_TYPES_MAPPER)
+
+
+def build_agent(n_fields: int) -> Agent:
+    return Agent(
+        id="bench-agent",
+        name="Benchmark agent",
+        goal="Collect a very large intake form",
+        created_at="2025-01-01T00:00:00",
+        fields=[
+            FormField(
+                name=f"Field {i}",
+                type=FIELD_TYPES[i % len(FIELD_TYPES)],
+                description=f"Detail number {i} the organization needs to collect",
+            )
+            for i in range(n_fields)
+        ],
+    )
+
+
+def prompt_parts(form) -> tuple[str, str]:
+    return model_fields_to_string(form), json.dumps(get_canonical_tool(form))
+
+
+def reset_caches() -> None:
+    utils._FORM_MODEL_CACHE.clear()
+    utils._TOOL_CACHE.clear()
+
+
+def time_turns(build, turns: int) -> tuple[float, float]:
+    """Returns the cold and median warm seconds of a turn's local work."""
+
+    reset_caches()
+    started = time.perf_counter()
+    build()
+    cold = time.perf_counter() - started
+
+    samples = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        build()
+        samples.append(time.perf_counter() - started)
+    return cold, median(samples)
+
+
+def live_ttft(form_details: str, tool: dict) -> float:
+    import openai
+
+    client = openai.OpenAI()
+    started = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=settings.ROUTING_RULES.default_model,
+        messages=[
+            {"role": "system", "content": f"Collect these fields:\n{form_details}"},
+            {"role": "user", "content": "Hi, I'd like to fill out the form."},
+        ],
+        tools=[tool],
+        stream=True,
+    )
+    try:
+        for _ in stream:
+            return time.perf_counter() - started
+    finally:
+        stream.close()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fields", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    agent = build_agent(args.fields)
+    sections = resolve_sections(
+        agent, settings.SECTION_AUTO_CHUNK_THRESHOLD, settings.SECTION_CHUNK_SIZE
+    )
+    full_data = {utils.field_key(field.name): None for field in agent.fields}
+    full_form = get_form_model(agent)
+    section_form = get_section_model(agent, sections[0])
+
+    def full_turn():
+        form = get_form_model(agent)
+        prompt_parts(form)
+        validate_form_values(full_data, form)
+
+    def section_turn():
+        form = get_section_model(agent, sections[0])
+        prompt_parts(form)
+        validate_form_values({}, form)
+
+    rows = []
+    for name, form, turn in (
+        ("whole form", full_form, full_turn),
+        (f"section ({len(sections)} total)", section_form, section_turn),
+    ):
+        details, tool = prompt_parts(form)
+        cold, warm = time_turns(turn, args.turns)
+        row = {
+            "layout": name,
+            "prompt_chars": len(details) + len(tool),
+            "approx_tokens": (len(details) + len(tool)) // 4,
+            "cold_ms": round(cold * 1000, 2),
+            "warm_ms": round(warm * 1000, 3),
+        }
+        if args.live:
+            if not os.getenv("OPENAI_API_KEY"):
+                raise SystemExit("--live requires OPENAI_API_KEY")
+            row["ttft_s"] = round(live_ttft(details, json.loads(tool)), 3)
+        rows.append(row)
+
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Per-turn overhead of tracing, exporting to a local spans-bulk collector.
+
+Usage:
+    python -m benchmarks.tracing [--turns 2000] [--collector-delay 0.0]
+
+Each turn opens a root span with three child spans, like a chat turn that
+routes, calls the model and validates. The caller's time per turn is measured
+without tracing, with every trace sampled out and with every trace exported. A
+slow collector (--collector-delay seconds per request) shows backpressure: the
+caller's latency stays flat and full queues drop traces instead.
+"""
+
+import argparse
+import json
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.core.metrics import metrics
+from src.core.tracing import SpanExporter, TraceSampler, Tracer
+from src.utils.constants import MetricNames
+
+CHILD_SPANS = ("route", "llm_call", "validate")
+HANDLED = (MetricNames.TRACE_SPANS_EXPORTED, MetricNames.TRACE_SPANS_DROPPED)
+
+
+class Collector:
+    """Counts the spans posted to it, optionally answering slowly."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.requests = 0
+        self.spans = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/spans-bulk"
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(collector.delay)
+                with collector._lock:
+                    collector.requests += 1
+                    collector.spans += len(json.loads(body)["spans"])
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
+
+
+def run_turns(tracer: Tracer | None, turns: int) -> float:
+    """Returns the caller's mean time per turn in microseconds."""
+
+    def span(name: str, **attributes):
+        return tracer.span(name, **attributes) if tracer else nullcontext()
+
+    started = time.perf_counter()
+    for turn in range(turns):
+        with span("intake_turn", agent_id="bench-agent", turn=turn):
+            for name in CHILD_SPANS:
+                with span(name):
+                    pass
+    return (time.perf_counter() - started) / turns * 1e6
+
+
+def wait_for_export(expected: float, timeout: float) -> None:
+    """Waits until the exporter exported or dropped `expected` spans in total."""
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if sum(metrics.get(name) for name in HANDLED) >= expected:
+            return
+        time.sleep(0.05)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--collector-delay", type=float, default=0.0)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    spans_per_turn = 1 + len(CHILD_SPANS)
+    baseline = run_turns(None, args.turns)
+    print(json.dumps({"case": "no tracing", "turn_us": round(baseline, 2)}))
+
+    for case, rate in (("sampled out", 0.0), ("exported", 1.0)):
+        collector = Collector(args.collector_delay)
+        exporter = SpanExporter(
+            collector.url, "benchmark", args.queue_size, args.batch_size, 0.1
+        )
+        before = metrics.snapshot()
+        turn_us = run_turns(Tracer(TraceSampler(rate, 60), exporter), args.turns)
+        submitted = args.turns * spans_per_turn if rate else 0
+        wait_for_export(sum(before.get(name, 0) for name in HANDLED) + submitted, 30)
+        after = metrics.snapshot()
+        collector.stop()
+
+        def delta(name: str) -> int:
+            return int(after.get(name, 0) - before.get(name, 0))
+
+        row = {
+            "case": case,
+            "collector_delay_s": args.collector_delay,
+            "turn_us": round(turn_us, 2),
+            "overhead_us": round(turn_us - baseline, 2),
+            "spans_exported": delta(MetricNames.TRACE_SPANS_EXPORTED),
+            "spans_dropped": delta(MetricNames.TRACE_SPANS_DROPPED),
+            "spans_sampled_out": delta(MetricNames.TRACE_SPANS_SAMPLED_OUT),
+            "export_errors": delta(MetricNames.TRACE_EXPORT_ERRORS),
+            "collector_requests": collector.requests,
+            "collector_spans": collector.spans,
+        }
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Bulk import and export of agent definitions.
+
+Usage:
+    python -m src.cli import agents.jsonl [--replace] [--workers N]
+    python -m src.cli export agents-backup.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from pydantic import ValidationError
+
+from src.core.config import settings
+from src.utils.utils import (
+    load_agents,
+    precompile_agent_tools,
+    save_agents,
+    save_precompiled_tools,
+    validate_agent_record,
+)
+
+VALIDATION_CHUNK_SIZE = 64
+
+
+def iter_agent_records(path: Path) -> Iterator[tuple[str, Any]]:
+    """Reads agent definitions from a JSON, JSONL or YAML file.
+
+    JSONL and YAML files are read one record at a time, JSON files are loaded
+    whole.
+
+    Yields:
+        tuple[str, Any]: Where the record is in the file, and the record. JSONL
+            lines that aren't valid JSON are yielded as their decode error so
+            they're reported along with the other invalid records.
+    """
+
+    suffix = path.suffix.lower()
+    if suffix == ".jsonl":
+        with path.open("r") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield f"line {line_number}", json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield f"line {line_number}", e
+    elif suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            msg = "Importing YAML files requires PyYAML: pip install pyyaml"
+            raise SystemExit(msg) from e
+        with path.open("r") as f:
+            documents = yaml.safe_load_all(f)
+            for idx, record in enumerate(_flatten(documents), start=1):
+                yield f"record {idx}", record
+    else:
+        with path.open("r") as f:
+            data = json.load(f)
+        for idx, record in enumerate(_flatten([data]), start=1):
+            yield f"record {idx}", record
+
+
+def _flatten(documents: Iterable[Any]) -> Iterator[Any]:
+    for document in documents:
+        yield from document if isinstance(document, list) else [document]
+
+
+def _prepare_record(
+    item: tuple[str, Any],
+) -> tuple[dict | None, dict[str, Any], str | None]:
+    location, record = item
+    if isinstance(record, json.JSONDecodeError):
+        return None, {}, f"at {location}: invalid JSON ({record})"
+    if not isinstance(record, dict):
+        kind = type(record).__name__
+        return None, {}, f"at {location}: expected an object, got {kind}"
+
+    record = {
+        "id": str(uuid.uuid4()),
+        "created_at": datetime.now().isoformat(),
+        **record,
+    }
+    try:
+        agent = validate_agent_record(record)
+    except (ValidationError, ValueError, TypeError) as e:
+        return None, {}, f"at {location} ({record.get('name', record['id'])}): {e}"
+
+    tools = precompile_agent_tools(
+        agent, settings.SECTION_AUTO_CHUNK_THRESHOLD, settings.SECTION_CHUNK_SIZE
+    )
+    return agent.model_dump(exclude_none=True), tools, None
+
+
+def import_agents(path: Path, replace: bool, workers: int | None) -> int:
+    agents, tools, errors = [], {}, []
+    workers = workers or os.cpu_count() or 1
+    records = iter_agent_records(path)
+    # executor.map submits the whole iterable up front, so records are handed to
+    # the pool in windows to keep the raw records of a large file out of memory.
+    window = VALIDATION_CHUNK_SIZE * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while batch := list(islice(records, window)):
+            results = executor.map(
+                _prepare_record, batch, chunksize=VALIDATION_CHUNK_SIZE
+            )
+            for agent, agent_tools, error in results:
+                if error:
+                    errors.append(error)
+                else:
+                    agents.append(agent)
+                    tools.update(agent_tools)
+
+    if errors:
+        for error in errors:
+            print(f"Invalid agent {error}", file=sys.stderr)
+        print(f"{len(errors)} invalid agents, nothing was imported.", file=sys.stderr)
+        return 1
+
+    try:
+        save_agents(agents, replace=replace)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    save_precompiled_tools(tools)
+    print(f"Imported {len(agents)} agents and precompiled {len(tools)} tool schemas.")
+    return 0
+
+
+def export_agents(path: Path) -> int:
+    agents = load_agents(as_dict=True)
+    with path.open("w") as f:
+        if path.suffix.lower() == ".jsonl":
+            for agent in agents:
+                f.write(json.dumps(agent) + "\n")
+        else:
+            json.dump(agents, f, indent=2)
+    print(f"Exported {len(agents)} agents to {path}.")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import and export agents.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import", help="Import agents from a JSON, JSONL or YAML file"
+    )
+    import_parser.add_argument("path", type=Path)
+    import_parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Replace stored agents that have the same id",
+    )
+    import_parser.add_argument(
+        "--workers", type=int, default=None, help="Number of validation processes"
+    )
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export agents to a JSON or JSONL file"
+    )
+    export_parser.add_argument("path", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "import":
+        return import_agents(args.path, args.replace, args.workers)
+    return export_agents(args.path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
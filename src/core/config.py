@@ -1,6 +1,10 @@
 from dotenv import load_dotenv
+from pydantic import Field, PositiveFloat, PositiveInt
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.models.routing import RoutingRules
+from src.utils.constants import PromptLayouts
+
 load_dotenv(override=True)
 
 
@@ -13,6 +17,34 @@ class Config(BaseSettings):
         env_file=".env", env_ignore_empty=True, extra="ignore"
     )
     PROMPTLAYER_API_KEY: str
+    FORM_REPAIR_MAX_ATTEMPTS: int = 1
+    LLM_FIRST_TOKEN_TIMEOUT: float = 20.0
+    LLM_STALL_TIMEOUT: float = 15.0
+    LLM_TOTAL_DEADLINE: float = 120.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF: float = 0.5
+    LLM_HEDGE_REQUESTS: bool = False
+    LLM_MAX_CONCURRENCY_PER_KEY: PositiveInt = 4
+    LLM_RATE_LIMIT_PER_SECOND: PositiveFloat = 2.0
+    LLM_RATE_LIMIT_BURST: float = Field(default=5.0, ge=1)
+    LLM_MAX_QUEUE_WAIT: float = 30.0
+    ROUTING_RULES: RoutingRules = RoutingRules()
+    SECTION_AUTO_CHUNK_THRESHOLD: int = 40
+    SECTION_CHUNK_SIZE: int = 20
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 50
+    PROMPT_LAYOUT: PromptLayouts = PromptLayouts.STANDARD
+    PROMPTLAYER_SDK_TRACING: bool = False
+    IMAGE_MAX_SIDE: int = 1568
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    TRACE_SAMPLE_RATE: float = 0.1
+    TRACE_SLOW_TURN_SECONDS: float = 10.0
+    TRACE_EXPORT_URL: str = "https://api.promptlayer.com/spans-bulk"
+    TRACE_QUEUE_SIZE: int = 1000
+    TRACE_BATCH_SIZE: int = 50
+    TRACE_FLUSH_INTERVAL: float = 2.0
 
 
 try:
@@ -0,0 +1,35 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Process-wide counters and summed observations shared by every session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[str(name)] += value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self._counters[f"{name}.count"] += 1
+            self._counters[f"{name}.sum"] += value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        with self._lock:
+            total = self._counters.get(denominator, 0)
+            return self._counters.get(numerator, 0) / total if total else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+
+metrics = Metrics()
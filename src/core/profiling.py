@@ -0,0 +1,131 @@
+import cProfile
+import functools
+import logging
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from src.core.config import settings
+
+TOP_ALLOCATIONS = 25
+
+logger = logging.getLogger(__name__)
+
+_active_sections: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar(
+    "active_profile_sections", default=None
+)
+
+
+class TurnProfiler:
+    """Samples chat turns and dumps cProfile stats and tracemalloc top allocations.
+
+    When the sample rate is 0 the turn and section wrappers reduce to a single
+    attribute or context variable lookup.
+    """
+
+    def __init__(self, sample_rate: float, output_dir: str, max_files: int):
+        self.sample_rate = sample_rate
+        self.output_dir = Path(output_dir)
+        self.max_files = max_files
+        self._tracemalloc_lock = threading.Lock()
+
+    @contextmanager
+    def profile_turn(self, agent_id: str, turn: int) -> Iterator[None]:
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            yield
+            return
+
+        sections: list[tuple[str, float]] = []
+        token = _active_sections.set(sections)
+        trace_memory = self._tracemalloc_lock.acquire(blocking=False)
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None
+
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot() if trace_memory else None
+            if started_tracing:
+                tracemalloc.stop()
+            if trace_memory:
+                self._tracemalloc_lock.release()
+            _active_sections.reset(token)
+            try:
+                self._dump(agent_id, turn, elapsed, profiler, snapshot, sections)
+            except OSError as e:
+                logger.warning("Couldn't write the profile of turn %s: %s", turn, e)
+
+    def section(self, name: str) -> Callable:
+        """Times the wrapped function when it runs inside a sampled turn."""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                sections = _active_sections.get()
+                if sections is None:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    sections.append((name, time.perf_counter() - started))
+
+            return wrapper
+
+        return decorator
+
+    def _dump(
+        self,
+        agent_id: str,
+        turn: int,
+        elapsed: float,
+        profiler: Optional[cProfile.Profile],
+        snapshot: Optional[tracemalloc.Snapshot],
+        sections: list[tuple[str, float]],
+    ) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        stem = self.output_dir / f"{agent_id}-turn{turn:04d}-{timestamp}"
+
+        if profiler is not None:
+            profiler.dump_stats(f"{stem}.prof")
+
+        lines = [f"agent: {agent_id}", f"turn: {turn}", f"total: {elapsed:.4f}s"]
+        lines += [f"section {name}: {duration:.4f}s" for name, duration in sections]
+        if snapshot is not None:
+            lines.append(f"top {TOP_ALLOCATIONS} allocations:")
+            stats = snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            lines += [str(stat) for stat in stats]
+        Path(f"{stem}.txt").write_text("\n".join(lines) + "\n")
+
+        self._rotate()
+
+    def _rotate(self) -> None:
+        reports = sorted(
+            self.output_dir.glob("*.txt"), key=lambda path: path.stat().st_mtime
+        )
+        for report in reports[: max(len(reports) - self.max_files, 0)]:
+            report.unlink(missing_ok=True)
+            report.with_suffix(".prof").unlink(missing_ok=True)
+
+
+turn_profiler = TurnProfiler(
+    settings.PROFILE_SAMPLE_RATE, settings.PROFILE_DIR, settings.PROFILE_MAX_FILES
+)
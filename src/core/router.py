@@ -0,0 +1,79 @@
+import re
+
+from src.core.metrics import metrics
+from src.models.form import MISSING_ERROR_TYPE, FormValidationResult
+from src.models.message import Message, Roles
+from src.models.routing import RouteDecision, RoutingRules, TurnSignals
+from src.utils.constants import MetricNames
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def closing_question(text: str) -> str:
+    """Returns the last sentence of a message when it's a question, else ''."""
+
+    text = text.strip().lower()
+    if not text.endswith("?"):
+        return ""
+    return _SENTENCE_END.split(text)[-1]
+
+
+def signals_for_turn(
+    rules: RoutingRules,
+    history: list[Message],
+    last_validation: FormValidationResult | None = None,
+    is_submission: bool = False,
+) -> TurnSignals:
+    """Derives routing signals from the conversation and the last submission.
+
+    Only depends on plain models, so decisions can be replayed offline from
+    recorded conversations and streams.
+    """
+
+    signals = TurnSignals(is_submission=is_submission)
+    if last_validation is not None and last_validation.submitted:
+        missing = [e for e in last_validation.errors if e.type == MISSING_ERROR_TYPE]
+        signals.missing_fields = len(missing)
+        signals.validation_failed = len(last_validation.errors) > len(missing)
+
+    last_assistant = next(
+        (
+            msg
+            for msg in reversed(history)
+            if msg.role == Roles.ASSISTANT and msg.content
+        ),
+        None,
+    )
+    if last_assistant is not None:
+        question = closing_question(last_assistant.content[0].text or "")
+        if any(cue.lower() in question for cue in rules.submission_cues):
+            signals.is_submission = True
+
+    return signals
+
+
+class ModelRouter:
+    def __init__(self, rules: RoutingRules):
+        self.rules = rules
+
+    def route(self, signals: TurnSignals, fallback_model: str) -> RouteDecision:
+        if not self.rules.enabled:
+            return RouteDecision(model=fallback_model, reason="disabled")
+
+        strong = self.rules.strong_model
+        if self.rules.escalate_on_validation_failure and signals.validation_failed:
+            return RouteDecision(model=strong, reason="validation_failure")
+        if (
+            self.rules.ambiguous_missing_fields
+            and signals.missing_fields >= self.rules.ambiguous_missing_fields
+        ):
+            return RouteDecision(model=strong, reason="ambiguous_extraction")
+        if self.rules.escalate_on_submission and signals.is_submission:
+            return RouteDecision(model=strong, reason="submission")
+        return RouteDecision(model=self.rules.default_model, reason="routine")
+
+    @staticmethod
+    def record(decision: RouteDecision, latency: float, success: bool) -> None:
+        route = f"{MetricNames.ROUTER_PREFIX}.{decision.model}.{decision.reason}"
+        metrics.observe(f"{route}.latency_seconds", latency)
+        metrics.increment(f"{route}.{'success' if success else 'failure'}")
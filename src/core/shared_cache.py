@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+from src.utils.constants import SHARED_CACHE_FILE
+
+SQLITE_TIMEOUT = 5.0
+
+
+class SharedCache:
+    """SQLite-backed key-value store shared by every worker process on the host.
+
+    Entries are immutable values keyed by content hash, while named version
+    stamps let workers detect changes with a single cheap query. Entries that
+    are no longer referenced are pruned when their group is republished.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions "
+                "(name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, str]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT key, value FROM entries WHERE key IN ({placeholders})", keys
+        ).fetchall()
+        return dict(rows)
+
+    def set_many(
+        self,
+        entries: dict[str, str],
+        bump: Optional[str] = None,
+        prune_prefix: Optional[str] = None,
+    ) -> int:
+        """Stores the entries and optionally bumps a version stamp atomically.
+
+        Args:
+            entries: The values to store, by key.
+            bump: The version stamp to bump.
+            prune_prefix: Deletes the other entries whose key has this prefix,
+                in the same transaction.
+
+        Returns:
+            int: The new version of `bump`, 0 if no version was bumped.
+        """
+
+        with self._conn as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)",
+                entries.items(),
+            )
+            if prune_prefix is not None:
+                keys = conn.execute(
+                    "SELECT key FROM entries WHERE key GLOB ?", (f"{prune_prefix}*",)
+                ).fetchall()
+                conn.executemany(
+                    "DELETE FROM entries WHERE key = ?",
+                    [(key,) for (key,) in keys if key not in entries],
+                )
+            if bump is None:
+                return 0
+            conn.execute(
+                "INSERT INTO versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (bump,),
+            )
+            return conn.execute(
+                "SELECT version FROM versions WHERE name = ?", (bump,)
+            ).fetchone()[0]
+
+    def version(self, name: str) -> int:
+        row = self._conn.execute(
+            "SELECT version FROM versions WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+
+shared_cache = SharedCache(SHARED_CACHE_FILE)
@@ -0,0 +1,198 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.utils.constants import MetricNames
+
+EXPORT_TIMEOUT = 5.0
+
+
+class Span(BaseModel):
+    name: str
+    trace_id: str
+    span_id: str = Field(default_factory=lambda: os.urandom(8).hex())
+    parent_id: Optional[str] = None
+    start_time: int = Field(default_factory=time.time_ns)
+    end_time: Optional[int] = None
+    error: Optional[str] = None
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def to_export(self) -> dict:
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent_id,
+            "kind": "SpanKind.INTERNAL",
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "status": {
+                "status_code": "ERROR" if self.error else "OK",
+                "description": self.error,
+            },
+            "attributes": self.attributes,
+            "events": [],
+            "links": [],
+            "resource": {"attributes": {"service.name": "intake-agent"}},
+        }
+
+
+class TraceSampler:
+    """Tail-samples whole traces: a share of all traces plus every error or slow one."""
+
+    def __init__(self, rate: float, slow_seconds: float):
+        self.rate = rate
+        self.slow_seconds = slow_seconds
+
+    def should_export(self, root: Span, spans: list[Span]) -> bool:
+        if any(span.error for span in spans):
+            return True
+        if root.duration >= self.slow_seconds:
+            return True
+        return random.random() < self.rate
+
+
+class SpanExporter:
+    """Exports span batches from a background thread through a bounded queue.
+
+    When the queue is full new traces are dropped, so exporting never adds
+    latency to a user's turn.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[list[dict]] = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, spans: list[dict]) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            metrics.increment(MetricNames.TRACE_SPANS_DROPPED, len(spans))
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.extend(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, spans: list[dict]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"spans": spans}, default=str).encode(),
+            headers={"Content-Type": "application/json", "X-API-KEY": self.api_key},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=EXPORT_TIMEOUT):
+                pass
+        except Exception:
+            metrics.increment(MetricNames.TRACE_EXPORT_ERRORS)
+            return
+        metrics.increment(MetricNames.TRACE_SPANS_EXPORTED, len(spans))
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_current_trace: ContextVar[Optional[list[Span]]] = ContextVar(
+    "current_trace", default=None
+)
+
+
+class Tracer:
+    def __init__(self, sampler: TraceSampler, exporter: SpanExporter):
+        self.sampler = sampler
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Records a span, starting a new trace when none is active.
+
+        Spans are buffered until the root span ends, then the whole trace is
+        sampled and handed to the exporter.
+        """
+
+        parent = _current_span.get()
+        trace = _current_trace.get()
+        is_root = trace is None
+        if is_root:
+            trace = []
+            trace_token = _current_trace.set(trace)
+
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        span_token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.end_time = time.time_ns()
+            trace.append(span)
+            _current_span.reset(span_token)
+            if is_root:
+                _current_trace.reset(trace_token)
+                if self.sampler.should_export(span, trace):
+                    self.exporter.submit([s.to_export() for s in trace])
+                else:
+                    metrics.increment(MetricNames.TRACE_SPANS_SAMPLED_OUT, len(trace))
+
+
+tracer = Tracer(
+    TraceSampler(settings.TRACE_SAMPLE_RATE, settings.TRACE_SLOW_TURN_SECONDS),
+    SpanExporter(
+        settings.TRACE_EXPORT_URL,
+        settings.PROMPTLAYER_API_KEY,
+        settings.TRACE_QUEUE_SIZE,
+        settings.TRACE_BATCH_SIZE,
+        settings.TRACE_FLUSH_INTERVAL,
+    ),
+)
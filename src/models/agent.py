@@ -8,9 +8,15 @@ class FormField(BaseModel):
     example: str | None = None
 
 
+class FormSection(BaseModel):
+    name: str
+    fields: list[str]
+
+
 class Agent(BaseModel):
     id: str
     name: str
     goal: str
     fields: list[FormField]
     created_at: str
+    sections: list[FormSection] | None = None
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field
+
+MISSING_ERROR_TYPE = "missing"
+
+
+class FieldError(BaseModel):
+    field: str
+    type: str
+    message: str
+
+
+class FormValidationResult(BaseModel):
+    submitted: bool = False
+    data: dict = Field(default_factory=dict)
+    errors: list[FieldError] = Field(default_factory=list)
+
+    @property
+    def is_valid(self) -> bool:
+        return self.submitted and not self.errors
+
+    @property
+    def failing_fields(self) -> list[str]:
+        return list(dict.fromkeys(error.field for error in self.errors))
+
+    @property
+    def repairable_errors(self) -> list[FieldError]:
+        """Errors on values that were submitted, the only ones a repair can fix."""
+
+        return [
+            error
+            for error in self.errors
+            if error.field in self.data and error.type != MISSING_ERROR_TYPE
+        ]
+
+    @property
+    def missing_fields(self) -> list[str]:
+        return list(
+            dict.fromkeys(
+                error.field
+                for error in self.errors
+                if error.type == MISSING_ERROR_TYPE
+            )
+        )
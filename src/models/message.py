@@ -12,7 +12,8 @@ class MessageContentTypes(StrEnum):
 
 class MessageContent(BaseModel):
     type: MessageContentTypes
-    text: str
+    text: str | None = None
+    image_ref: str | None = None
 
 
 class Roles(StrEnum):
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+
+from src.utils.constants import OPENAI_MODELS
+
+
+class RoutingRules(BaseModel):
+    enabled: bool = True
+    default_model: str = OPENAI_MODELS[0]
+    strong_model: str = OPENAI_MODELS[-1]
+    escalate_on_validation_failure: bool = True
+    escalate_on_submission: bool = True
+    ambiguous_missing_fields: int = Field(
+        default=1,
+        description="Escalate when the last submission omitted at least this many "
+        "fields. 0 disables the rule.",
+    )
+    submission_cues: list[str] = Field(
+        default_factory=lambda: [
+            "is this correct",
+            "is everything correct",
+            "is all of this correct",
+            "confirm these details",
+            "ready to submit",
+            "shall i submit",
+            "should i submit",
+        ],
+        description="Phrases that mark the next turn as the final submission when "
+        "the last assistant message ends with a question containing one of them.",
+    )
+
+
+class TurnSignals(BaseModel):
+    validation_failed: bool = False
+    missing_fields: int = 0
+    is_submission: bool = False
+
+
+class RouteDecision(BaseModel):
+    model: str
+    reason: str
@@ -1,25 +1,75 @@
+import json
+import time
+import uuid
+
 import streamlit as st
 from promptlayer import PromptLayer
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 from pydantic import BaseModel
 
 from src.core.config import settings
-from src.models.agent import Agent
+from src.core.metrics import metrics
+from src.core.profiling import turn_profiler
+from src.core.router import ModelRouter, signals_for_turn
+from src.core.tracing import tracer
+from src.models.agent import Agent, FormField, FormSection
+from src.models.form import FormValidationResult
 from src.models.message import Message, MessageContent, MessageContentTypes, Roles
+from src.streaming.deadline import (
+    DeadlinePolicy,
+    DeadlineStream,
+    LLMCallError,
+    LLMTimeoutError,
+)
 from src.streaming.message_builder import StreamMessageBuilder
 from src.streaming.processor import StreamProcessor
+from src.streaming.scheduler import llm_scheduler
 from src.utils import constants as c
+from src.utils.images import (
+    ImageError,
+    encode_image,
+    get_image_bytes,
+    image_payloads,
+    history_image_refs,
+    resolve_images,
+    serialize_message,
+    to_prompt_message,
+)
 from src.utils.utils import (
-    convert_pydantic_to_openai_tool,
-    create_dynamic_model,
-    fetch_form_data,
+    build_cacheable_form_details,
+    create_repair_model,
+    field_key,
+    format_repair_request,
+    format_validation_feedback,
+    get_canonical_tool,
+    get_form_model,
+    get_section_fields,
+    get_section_model,
     load_agents,
     model_fields_to_string,
+    resolve_sections,
+    validate_form_data,
+    validate_form_values,
 )
 
 
 class ChatApp:
     def __init__(self):
-        self.pl_client = PromptLayer(settings.PROMPTLAYER_API_KEY, enable_tracing=True)
+        self.pl_client = PromptLayer(
+            settings.PROMPTLAYER_API_KEY,
+            enable_tracing=settings.PROMPTLAYER_SDK_TRACING,
+        )
+        self.deadline_stream = DeadlineStream(
+            DeadlinePolicy(
+                first_token_timeout=settings.LLM_FIRST_TOKEN_TIMEOUT,
+                stall_timeout=settings.LLM_STALL_TIMEOUT,
+                total_deadline=settings.LLM_TOTAL_DEADLINE,
+                max_retries=settings.LLM_MAX_RETRIES,
+                retry_backoff=settings.LLM_RETRY_BACKOFF,
+                hedge=settings.LLM_HEDGE_REQUESTS,
+            )
+        )
+        self.router = ModelRouter(settings.ROUTING_RULES)
         self.initialize_session_state()
         self.setup_sidebar()
         st.markdown(c.CHAT_MARKDOWN_STYLE, unsafe_allow_html=True)
@@ -35,6 +85,24 @@ class ChatApp:
         if c.StateVariables.FORM_DATA not in st.session_state:
             st.session_state[c.StateVariables.FORM_DATA] = {}
 
+        if c.StateVariables.LAST_VALIDATION not in st.session_state:
+            st.session_state[c.StateVariables.LAST_VALIDATION] = None
+
+        if c.StateVariables.SERIALIZED_HISTORY not in st.session_state:
+            st.session_state[c.StateVariables.SERIALIZED_HISTORY] = []
+
+        if c.StateVariables.TURN_USAGE not in st.session_state:
+            st.session_state[c.StateVariables.TURN_USAGE] = []
+
+        if c.StateVariables.CURRENT_SECTION not in st.session_state:
+            st.session_state[c.StateVariables.CURRENT_SECTION] = 0
+
+        if c.StateVariables.UPLOAD_KEY not in st.session_state:
+            st.session_state[c.StateVariables.UPLOAD_KEY] = 0
+
+        if c.StateVariables.SESSION_ID not in st.session_state:
+            st.session_state[c.StateVariables.SESSION_ID] = str(uuid.uuid4())
+
         if c.StateVariables.MODEL_NAME not in st.session_state:
             st.session_state[c.StateVariables.MODEL_NAME] = c.OPENAI_MODELS[0]
 
@@ -79,21 +147,91 @@ class ChatApp:
             else:
                 st.warning("Current Status: API Key not set")
 
+            self.render_metrics()
+
+    @staticmethod
+    def render_metrics() -> None:
+        with st.expander("Metrics"):
+            repair_rate = metrics.ratio(
+                c.MetricNames.FORM_REPAIR_TURNS, c.MetricNames.FORM_SUBMISSIONS
+            )
+            cache_hit_rate = metrics.ratio(
+                c.MetricNames.CACHED_PROMPT_TOKENS, c.MetricNames.PROMPT_TOKENS
+            )
+            st.metric("Form repair rate", f"{repair_rate:.0%}")
+            queue_wait = metrics.ratio(
+                f"{c.MetricNames.SCHEDULER_QUEUE_WAIT}.sum",
+                f"{c.MetricNames.SCHEDULER_QUEUE_WAIT}.count",
+            )
+            st.metric("Prompt cache hit rate", f"{cache_hit_rate:.0%}")
+            st.metric("Average LLM queue wait", f"{queue_wait:.2f}s")
+            st.metric(
+                "Prompt tokens saved by repairs (approx.)",
+                int(metrics.get(c.MetricNames.FORM_REPAIR_CHARS_SAVED) / 4),
+            )
+            st.json(metrics.snapshot())
+
     def display_chat_history(self) -> None:
         for message in st.session_state[c.StateVariables.CONVERSATION_HISTORY]:
             message: Message
             if message.content:
                 with st.chat_message(message.role):
                     if message.role == Roles.TOOL:
-                        st.json(message.content)
-                    else:
-                        st.markdown(message.content[0].text)
+                        st.json([content.model_dump() for content in message.content])
+                        continue
+
+                    for content in message.content:
+                        if content.type == MessageContentTypes.IMAGE:
+                            image = get_image_bytes(content.image_ref)
+                            if image is not None:
+                                st.image(image, width=c.IMAGE_PREVIEW_WIDTH)
+                        else:
+                            st.markdown(content.text)
+
+    @staticmethod
+    def serialize_history(conversation_history: list[Message]) -> list[dict]:
+        """Serializes only the messages appended since the previous turn.
+
+        The session keeps image references, payloads are only resolved into
+        the returned prompt history.
+        """
+
+        serialized = st.session_state[c.StateVariables.SERIALIZED_HISTORY]
+        if len(serialized) > len(conversation_history):
+            serialized = []
+        serialized.extend(
+            serialize_message(msg, exclude_none=True)
+            for msg in conversation_history[len(serialized) :]
+        )
+        st.session_state[c.StateVariables.SERIALIZED_HISTORY] = serialized
+        return [resolve_images(data) for data in serialized]
+
+    @staticmethod
+    def encode_uploads(uploads: list[UploadedFile]) -> list[str]:
+        """Encodes the uploaded images, reporting the ones that can't be read.
 
+        Unreadable images are left out so the rest of the message still goes
+        through.
+        """
+
+        refs = []
+        for upload in uploads:
+            try:
+                refs.append(
+                    encode_image(upload, st.session_state[c.StateVariables.SESSION_ID])
+                )
+            except ImageError as e:
+                st.error(f"Couldn't read '{upload.name}', it was not sent. ({e})")
+        return refs
+
+    @turn_profiler.section("get_prompt_inputs")
     def get_prompt_inputs(
         self,
-        agent_name: str,
+        agent_data: Agent,
         form: type[BaseModel],
         prompt: str,
+        section: FormSection | None = None,
+        image_refs: list[str] | None = None,
     ) -> dict:
         conversation_history: list[Message] = st.session_state[
             c.StateVariables.CONVERSATION_HISTORY
@@ -105,49 +243,377 @@ class ChatApp:
                         type=MessageContentTypes.TEXT,
                         text=prompt,
                     )
+                ]
+                + [
+                    MessageContent(type=MessageContentTypes.IMAGE, image_ref=ref)
+                    for ref in image_refs or []
                 ],
             )
         ]
         st.session_state[c.StateVariables.CONVERSATION_HISTORY] = conversation_history
 
+        if settings.PROMPT_LAYOUT == c.PromptLayouts.CACHE_FRIENDLY:
+            form_details = build_cacheable_form_details(agent_data.goal, form)
+            history = self.serialize_history(conversation_history)
+        else:
+            form_details = model_fields_to_string(form)
+            history = [to_prompt_message(msg) for msg in conversation_history]
+
+        if section is not None:
+            form_details = (
+                f"Only collect the fields of the current section, "
+                f"'{section.name}':\n{form_details}"
+            )
+
         return {
-            c.FormPromptVariables.AGENT_NAME: agent_name,
-            c.FormPromptVariables.FORM_DETAILS: model_fields_to_string(form),
-            c.FormPromptVariables.CONVERSATION_HISTORY: [
-                msg.model_dump() for msg in conversation_history
-            ],
+            c.FormPromptVariables.AGENT_NAME: agent_data.name,
+            c.FormPromptVariables.FORM_DETAILS: form_details,
+            c.FormPromptVariables.CONVERSATION_HISTORY: history,
         }
 
+    @staticmethod
+    def prompt_size(inputs: dict, form: type[BaseModel]) -> int:
+        return len(json.dumps(inputs, default=str)) + len(
+            json.dumps(get_canonical_tool(form))
+        )
+
+    def run_form_prompt(
+        self,
+        inputs: dict,
+        form: type[BaseModel],
+        model_name: str,
+        response_placeholder=None,
+    ) -> StreamProcessor:
+        overrides = {
+            "model": model_name,
+            "tools": [get_canonical_tool(form)],
+            "timeout": self.deadline_stream.policy.read_timeout,
+        }
+        if settings.PROMPT_LAYOUT == c.PromptLayouts.CACHE_FRIENDLY:
+            overrides["stream_options"] = {"include_usage": True}
+
+        with (
+            tracer.span("llm_call", model=model_name, tool=form.__name__) as span,
+            llm_scheduler.slot(
+                st.session_state[c.StateVariables.OPENAI_API_KEY],
+                st.session_state[c.StateVariables.SESSION_ID],
+                st.session_state[c.StateVariables.AGENT_DATA].id,
+            ) as admission,
+        ):
+            span.attributes["queue_wait"] = admission.wait
+            if response_placeholder and admission.wait >= c.QUEUE_WAIT_NOTICE:
+                st.caption(f"⏳ Waited {admission.wait:.1f}s for a free slot")
+            stream = self.deadline_stream.stream(
+                lambda: self.pl_client.run(
+                    c.PromptNames.FORM_PROMPT,
+                    input_variables=inputs,
+                    stream=True,
+                    model_parameter_overrides=overrides,
+                ),
+                admission,
+            )
+            processor = StreamProcessor()
+            result = processor.process_stream(stream, response_placeholder)
+            span.attributes["tool_calls"] = len(result.tool_calls)
+            return result
+
+    def repair_form_data(
+        self,
+        agent_data: Agent,
+        fields: list[FormField],
+        form: type[BaseModel],
+        validation: FormValidationResult,
+        full_prompt_size: int,
+    ) -> FormValidationResult:
+        for _ in range(settings.FORM_REPAIR_MAX_ATTEMPTS):
+            repairable = [error.field for error in validation.repairable_errors]
+            if not repairable:
+                break
+
+            repair_form = create_repair_model(agent_data.id, fields, repairable)
+            repair_request = Message(
+                role=Roles.USER,
+                content=[
+                    MessageContent(
+                        type=MessageContentTypes.TEXT,
+                        text=format_repair_request(validation),
+                    )
+                ],
+            )
+            inputs = {
+                c.FormPromptVariables.AGENT_NAME: agent_data.name,
+                c.FormPromptVariables.FORM_DETAILS: model_fields_to_string(
+                    repair_form
+                ),
+                c.FormPromptVariables.CONVERSATION_HISTORY: [
+                    to_prompt_message(repair_request)
+                ],
+            }
+            metrics.increment(c.MetricNames.FORM_REPAIR_TURNS)
+            metrics.increment(
+                c.MetricNames.FORM_REPAIR_CHARS_SAVED,
+                max(full_prompt_size - self.prompt_size(inputs, repair_form), 0),
+            )
+
+            decision = self.router.route(
+                signals_for_turn(
+                    self.router.rules, [], validation, is_submission=True
+                ),
+                st.session_state[c.StateVariables.MODEL_NAME],
+            )
+            started = time.perf_counter()
+            try:
+                result = self.run_form_prompt(inputs, repair_form, decision.model)
+            except LLMCallError:
+                self.router.record(decision, time.perf_counter() - started, False)
+                break
+            repaired = validate_form_data(result.tool_calls.values(), repair_form)
+            if not repaired.submitted:
+                self.router.record(decision, time.perf_counter() - started, False)
+                break
+
+            validation = validate_form_values(
+                {**validation.data, **repaired.data}, form
+            )
+            self.router.record(
+                decision, time.perf_counter() - started, validation.is_valid
+            )
+            if validation.is_valid:
+                metrics.increment(c.MetricNames.FORM_REPAIR_SUCCESSES)
+                break
+
+        return validation
+
+    @staticmethod
+    def record_usage(result: StreamProcessor) -> None:
+        if result.usage is None:
+            return
+
+        turn_usage = st.session_state[c.StateVariables.TURN_USAGE]
+        turn_usage.append(
+            {
+                "turn": len(turn_usage) + 1,
+                "prompt_tokens": result.usage.prompt_tokens,
+                "cached_tokens": result.cached_tokens,
+            }
+        )
+        metrics.increment(c.MetricNames.PROMPT_TOKENS, result.usage.prompt_tokens)
+        metrics.increment(c.MetricNames.CACHED_PROMPT_TOKENS, result.cached_tokens)
+
+    def append_tool_result(self, tool_call_id: str | None, text: str) -> None:
+        st.session_state[c.StateVariables.CONVERSATION_HISTORY].append(
+            Message(
+                role=Roles.TOOL,
+                tool_call_id=tool_call_id,
+                content=[MessageContent(type=MessageContentTypes.TEXT, text=text)],
+            )
+        )
+
+    def complete_section(
+        self,
+        agent_data: Agent,
+        sections: list[FormSection],
+        validation: FormValidationResult,
+        tool_call_id: str | None,
+    ) -> FormValidationResult | None:
+        """Merges a validated section into the form data and moves on.
+
+        The merged data is validated against the full form, so once every section
+        was collected, e.g. after a section was sent back for fixing, the form is
+        submitted instead of collecting the later sections again.
+
+        Returns:
+            FormValidationResult | None: The full form validation once no section
+                is missing fields, None while sections remain.
+        """
+
+        form_data = {**st.session_state[c.StateVariables.FORM_DATA], **validation.data}
+        st.session_state[c.StateVariables.FORM_DATA] = form_data
+        merged = validate_form_values(form_data, get_form_model(agent_data))
+        current = st.session_state[c.StateVariables.CURRENT_SECTION]
+        order = [*range(current + 1, len(sections)), *range(current + 1)]
+        missing = self.first_section_with(sections, merged.missing_fields, order)
+        if missing is None:
+            return merged
+
+        pending = self.first_section_with(sections, merged.failing_fields, order)
+        st.session_state[c.StateVariables.CURRENT_SECTION] = pending
+        self.append_tool_result(
+            tool_call_id,
+            f"Section '{sections[current].name}' saved. "
+            f"Continue with section '{sections[pending].name}'.",
+        )
+        st.info(f"Section '{sections[current].name}' complete")
+        return None
+
+    @staticmethod
+    def first_section_with(
+        sections: list[FormSection], fields: list[str], order: list[int]
+    ) -> int | None:
+        """Returns the first index in `order` whose section has one of `fields`."""
+
+        keys = set(fields)
+        return next(
+            (
+                idx
+                for idx in order
+                if any(field_key(name) in keys for name in sections[idx].fields)
+            ),
+            None,
+        )
+
+    def repair_full_form(
+        self,
+        agent_data: Agent,
+        sections: list[FormSection],
+        validation: FormValidationResult,
+        inputs: dict,
+    ) -> FormValidationResult:
+        """Repairs the merged form when it fails validation after the last section.
+
+        Values that can't be repaired send the conversation back to the first
+        section that still has a failing field.
+        """
+
+        if validation.repairable_errors:
+            form = get_form_model(agent_data)
+            with st.spinner("Fixing invalid fields..."):
+                validation = self.repair_form_data(
+                    agent_data,
+                    agent_data.fields,
+                    form,
+                    validation,
+                    self.prompt_size(inputs, form),
+                )
+        st.session_state[c.StateVariables.LAST_VALIDATION] = validation
+        if validation.is_valid:
+            return validation
+
+        send_back = self.first_section_with(
+            sections, validation.failing_fields, list(range(len(sections)))
+        )
+        if send_back is not None:
+            st.session_state[c.StateVariables.CURRENT_SECTION] = send_back
+        return validation
+
     def process_user_input(
         self,
         prompt: str,
+        uploads: list[UploadedFile] | None = None,
     ) -> None:
         agent_data: Agent = st.session_state[c.StateVariables.AGENT_DATA]
-        form = create_dynamic_model(agent_data.fields)
+        turn = 1 + sum(
+            message.role == Roles.USER
+            for message in st.session_state[c.StateVariables.CONVERSATION_HISTORY]
+        )
+        with (
+            tracer.span("intake_turn", agent_id=agent_data.id, turn=turn),
+            turn_profiler.profile_turn(agent_data.id, turn),
+        ):
+            self._process_user_input(agent_data, prompt, uploads or [])
+
+    def _process_user_input(
+        self, agent_data: Agent, prompt: str, uploads: list[UploadedFile]
+    ) -> None:
+        sections = resolve_sections(
+            agent_data,
+            settings.SECTION_AUTO_CHUNK_THRESHOLD,
+            settings.SECTION_CHUNK_SIZE,
+        )
+        section = None
+        if sections:
+            current = min(
+                st.session_state[c.StateVariables.CURRENT_SECTION], len(sections) - 1
+            )
+            section = sections[current]
+            fields = get_section_fields(agent_data, section)
+            form = get_section_model(agent_data, section)
+        else:
+            fields = agent_data.fields
+            form = get_form_model(agent_data)
 
+        refs = self.encode_uploads(uploads)
         with st.chat_message(c.USER_MESSAGE):
             st.markdown(prompt)
+            for ref in refs:
+                image = get_image_bytes(ref)
+                if image is not None:
+                    st.image(image, width=c.IMAGE_PREVIEW_WIDTH)
 
         with st.chat_message(c.ASSISTANT_MESSAGE):
             response_placeholder = st.empty()
-            inputs = self.get_prompt_inputs(agent_data.name, form, prompt)
-            stream = self.pl_client.run(
-                c.PromptNames.FORM_PROMPT,
-                input_variables=inputs,
-                stream=True,
-                model_parameter_overrides={
-                    "tools": [convert_pydantic_to_openai_tool(form)]
-                },
+            decision = self.router.route(
+                signals_for_turn(
+                    self.router.rules,
+                    st.session_state[c.StateVariables.CONVERSATION_HISTORY],
+                    st.session_state[c.StateVariables.LAST_VALIDATION],
+                ),
+                st.session_state[c.StateVariables.MODEL_NAME],
             )
-            processor = StreamProcessor()
-            result = processor.process_stream(stream, response_placeholder)
+            inputs = self.get_prompt_inputs(agent_data, form, prompt, section, refs)
+            started = time.perf_counter()
+            try:
+                result = self.run_form_prompt(
+                    inputs, form, decision.model, response_placeholder
+                )
+            except LLMTimeoutError as e:
+                self.router.record(decision, time.perf_counter() - started, False)
+                st.error(
+                    f"The assistant didn't respond in time, please try again. ({e})"
+                )
+                return
+            except LLMCallError as e:
+                self.router.record(decision, time.perf_counter() - started, False)
+                st.error(f"The assistant request failed. ({e})")
+                return
+            self.record_usage(result)
             new_messages = StreamMessageBuilder.build_messages(result)
             st.session_state[c.StateVariables.CONVERSATION_HISTORY].extend(new_messages)
 
-            if result.has_tool_calls:
-                form_data = fetch_form_data(result.tool_calls.values(), form)
-                st.success("Form submitted successfully!")
-                st.table(form_data)
+            latency = time.perf_counter() - started
+            validation = validate_form_data(result.tool_calls.values(), form)
+            self.router.record(
+                decision, latency, not validation.submitted or validation.is_valid
+            )
+
+            if validation.submitted:
+                metrics.increment(c.MetricNames.FORM_SUBMISSIONS)
+                if not validation.is_valid:
+                    metrics.increment(c.MetricNames.FORM_VALIDATION_FAILURES)
+                if validation.repairable_errors:
+                    with st.spinner("Fixing invalid fields..."):
+                        validation = self.repair_form_data(
+                            agent_data,
+                            fields,
+                            form,
+                            validation,
+                            self.prompt_size(inputs, form),
+                        )
+                st.session_state[c.StateVariables.LAST_VALIDATION] = validation
+
+                tool_call = next(iter(result.tool_calls.values()))
+                if validation.is_valid and sections:
+                    validation = self.complete_section(
+                        agent_data, sections, validation, tool_call.id
+                    )
+                    if validation is None:
+                        return
+                    validation = self.repair_full_form(
+                        agent_data, sections, validation, inputs
+                    )
+
+                if validation.is_valid:
+                    st.session_state[c.StateVariables.FORM_DATA] = validation.data
+                    st.success("Form submitted successfully!")
+                    st.table(validation.data)
+                else:
+                    self.append_tool_result(
+                        tool_call.id, format_validation_feedback(validation)
+                    )
+                    st.warning(
+                        "Some fields are still invalid: "
+                        + ", ".join(validation.failing_fields or ["form"])
+                    )
 
     def select_agent(self) -> dict:
         agents = load_agents()
@@ -166,8 +632,18 @@ class ChatApp:
             self.select_agent()
 
         if st.button("Clear Chat", use_container_width=True, key="clear_chat"):
+            image_payloads.discard(
+                history_image_refs(
+                    st.session_state[c.StateVariables.CONVERSATION_HISTORY]
+                ),
+                st.session_state[c.StateVariables.SESSION_ID],
+            )
             st.session_state[c.StateVariables.CONVERSATION_HISTORY] = []
             st.session_state[c.StateVariables.FORM_DATA] = {}
+            st.session_state[c.StateVariables.LAST_VALIDATION] = None
+            st.session_state[c.StateVariables.CURRENT_SECTION] = 0
+            st.session_state[c.StateVariables.SERIALIZED_HISTORY] = []
+            st.session_state[c.StateVariables.TURN_USAGE] = []
             st.rerun()
 
         st.divider()
@@ -180,8 +656,16 @@ class ChatApp:
             st.markdown("</div>", unsafe_allow_html=True)
 
         if agent_data and st.session_state[c.StateVariables.OPENAI_API_KEY]:
+            uploads = st.file_uploader(
+                "Attach images (e.g. ID or insurance card photos)",
+                type=c.IMAGE_UPLOAD_TYPES,
+                accept_multiple_files=True,
+                key=f"image_upload_{st.session_state[c.StateVariables.UPLOAD_KEY]}",
+            )
             if prompt := st.chat_input("What is up?"):
-                self.process_user_input(prompt)
+                if uploads:
+                    st.session_state[c.StateVariables.UPLOAD_KEY] += 1
+                self.process_user_input(prompt, uploads)
 
         if not st.session_state[c.StateVariables.OPENAI_API_KEY]:
             st.warning("Please set an OpenAI API key to start chatting.")
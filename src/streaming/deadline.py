@@ -0,0 +1,358 @@
+import inspect
+import queue
+import random
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Generator, Iterator, Optional, Protocol
+
+import httpx
+import openai
+from pydantic import BaseModel
+
+from src.core.metrics import metrics
+from src.utils.constants import MetricNames
+
+_DONE = "done"
+_ERROR = "error"
+_TOKEN = "token"
+
+
+class LLMCallError(Exception):
+    """Raised when an LLM call can't be completed within its policy."""
+
+    retryable = False
+
+
+class LLMTimeoutError(LLMCallError):
+    """Raised when an LLM stream misses one of its deadlines."""
+
+    retryable = True
+
+
+class LLMUpstreamError(LLMCallError):
+    """Raised when the upstream request fails, e.g. with an HTTP error."""
+
+    def __init__(
+        self, message: str, retryable: bool, retry_after: Optional[float] = None
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class AdmissionControl(Protocol):
+    """Rate limits the extra upstream requests of an admitted call."""
+
+    def acquire(self, timeout: float) -> None:
+        """Blocks until another request may be sent.
+
+        Raises:
+            LLMCallError: If that takes longer than `timeout` seconds.
+        """
+
+    def try_acquire(self) -> bool:
+        """Returns whether another request may be sent right away."""
+
+    def backoff(self, seconds: float) -> None:
+        """Holds back every request sharing the limit for `seconds`."""
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Only timeouts, rate limits and server errors are worth another attempt."""
+
+    if isinstance(
+        error, (TimeoutError, httpx.TimeoutException, openai.APITimeoutError)
+    ):
+        return True
+    code = status_code(error)
+    if code == 429:
+        return getattr(error, "code", None) != "insufficient_quota"
+    return code is not None and code >= 500
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Returns the seconds the upstream asked to wait before retrying, if any."""
+
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return float(headers[header]) / scale
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+class DeadlinePolicy(BaseModel):
+    first_token_timeout: float = 20.0
+    stall_timeout: float = 15.0
+    total_deadline: float = 120.0
+    max_retries: int = 2
+    retry_backoff: float = 0.5
+    hedge: bool = False
+    hedge_min_samples: int = 20
+
+    @property
+    def read_timeout(self) -> float:
+        """Socket read timeout to pass to the upstream request.
+
+        Streams that can't be closed from the caller, e.g. generators, are only
+        unblocked by their own read timeout, so it mirrors the stream deadlines.
+        """
+
+        return max(self.first_token_timeout, self.stall_timeout)
+
+
+class LatencyTracker:
+    """Keeps a sliding window of samples to estimate tail latency."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+class _StreamWorker(threading.Thread):
+    def __init__(
+        self, name: str, factory: Callable[[], Iterator[Any]], out: queue.Queue
+    ):
+        super().__init__(name=f"llm-stream-{name}", daemon=True)
+        self.key = name
+        self.factory = factory
+        self.out = out
+        self.cancelled = threading.Event()
+        self._stream: Any = None
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        stream = None
+        try:
+            stream = self.factory()
+            with self._lock:
+                self._stream = stream
+            if self.cancelled.is_set():
+                return
+            for token in stream:
+                if self.cancelled.is_set():
+                    break
+                self.out.put((self.key, _TOKEN, token))
+            else:
+                self.out.put((self.key, _DONE, None))
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.out.put((self.key, _ERROR, e))
+        finally:
+            close = getattr(stream, "close", None)
+            if self.cancelled.is_set() and close:
+                self._close(close)
+
+    def cancel(self) -> None:
+        """Stops the worker, aborting its response from the caller's thread.
+
+        The response's socket is shut down first, closing it alone doesn't wake
+        a read blocked on a stalled connection. Generators can't be reached
+        while another thread runs them, those stop on their next token or their
+        request's read timeout.
+        """
+
+        self.cancelled.set()
+        with self._lock:
+            stream = self._stream
+        if stream is None or inspect.isgenerator(stream):
+            return
+        self._close(lambda: _shutdown_socket(stream))
+        close = getattr(stream, "close", None)
+        if close:
+            self._close(close)
+
+    @staticmethod
+    def _close(close: Callable[[], Any]) -> None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def _shutdown_socket(stream: Any) -> None:
+    response = getattr(stream, "response", stream)
+    extensions = getattr(response, "extensions", None) or {}
+    network_stream = extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream else None
+    if sock is not None:
+        sock.shutdown(socket.SHUT_RDWR)
+
+
+class DeadlineStream:
+    """Wraps a streaming LLM call with deadlines, jittered retries and hedging.
+
+    Retries and hedging only happen before the first token is handed to the
+    caller, so a partially rendered response is never duplicated.
+    """
+
+    def __init__(
+        self,
+        policy: DeadlinePolicy,
+        ttft_tracker: Optional[LatencyTracker] = None,
+    ):
+        self.policy = policy
+        self.ttft_tracker = ttft_tracker if ttft_tracker is not None else ttft
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.policy.hedge:
+            return None
+        if len(self.ttft_tracker) < self.policy.hedge_min_samples:
+            return None
+        return self.ttft_tracker.percentile(0.95)
+
+    def stream(
+        self,
+        factory: Callable[[], Iterator[Any]],
+        admission: Optional[AdmissionControl] = None,
+    ) -> Generator[Any, None, None]:
+        """Streams the tokens of the call made by `factory`.
+
+        Args:
+            factory: Starts the upstream request and returns its token iterator.
+            admission: Rate limits retries and hedged requests, the first
+                request is expected to be admitted by the caller.
+        """
+
+        deadline = time.monotonic() + self.policy.total_deadline
+        for attempt in range(self.policy.max_retries + 1):
+            if attempt and admission is not None:
+                admission.acquire(deadline - time.monotonic())
+            delivered = False
+            try:
+                for token in self._attempt(factory, deadline, admission):
+                    delivered = True
+                    yield token
+                return
+            except LLMCallError as e:
+                sleep = random.uniform(0, self.policy.retry_backoff * 2**attempt)
+                wait = getattr(e, "retry_after", None)
+                if wait is not None:
+                    sleep = max(sleep, wait)
+                    if admission is not None:
+                        admission.backoff(wait)
+                if (
+                    delivered
+                    or not e.retryable
+                    or attempt == self.policy.max_retries
+                    or time.monotonic() + sleep >= deadline
+                ):
+                    raise
+                metrics.increment(MetricNames.LLM_RETRIES)
+                time.sleep(sleep)
+
+    def _attempt(
+        self,
+        factory: Callable[[], Iterator[Any]],
+        deadline: float,
+        admission: Optional[AdmissionControl],
+    ) -> Generator[Any, None, None]:
+        out: queue.Queue = queue.Queue()
+        started = time.monotonic()
+        workers = {"primary": _StreamWorker("primary", factory, out)}
+        workers["primary"].start()
+        hedge_at = self._hedge_delay()
+        winner: Optional[str] = None
+        failed: set[str] = set()
+        last_token = started
+
+        try:
+            while True:
+                now = time.monotonic()
+                if winner is None:
+                    limit = min(deadline, started + self.policy.first_token_timeout)
+                    if hedge_at is not None and "hedge" not in workers:
+                        limit = min(limit, started + hedge_at)
+                else:
+                    limit = min(deadline, last_token + self.policy.stall_timeout)
+
+                try:
+                    key, kind, payload = out.get(timeout=max(limit - now, 0))
+                except queue.Empty:
+                    now = time.monotonic()
+                    if (
+                        winner is None
+                        and hedge_at is not None
+                        and "hedge" not in workers
+                        and now < started + self.policy.first_token_timeout
+                    ):
+                        if admission is not None and not admission.try_acquire():
+                            hedge_at = None
+                            continue
+                        metrics.increment(MetricNames.LLM_HEDGED_REQUESTS)
+                        workers["hedge"] = _StreamWorker("hedge", factory, out)
+                        workers["hedge"].start()
+                        continue
+                    raise self._timeout(winner, now, deadline)
+
+                if winner is not None and key != winner:
+                    continue
+
+                if kind == _ERROR:
+                    failed.add(key)
+                    if winner is None and any(
+                        worker.is_alive()
+                        for k, worker in workers.items()
+                        if k not in failed
+                    ):
+                        continue
+                    raise LLMUpstreamError(
+                        f"LLM stream failed: {payload}",
+                        is_retryable(payload),
+                        retry_after(payload),
+                    ) from payload
+
+                if winner is None:
+                    winner = key
+                    self.ttft_tracker.add(time.monotonic() - started)
+                    metrics.observe(MetricNames.LLM_TTFT, time.monotonic() - started)
+                    for other, worker in workers.items():
+                        if other != key:
+                            worker.cancel()
+
+                if kind == _DONE:
+                    return
+
+                last_token = time.monotonic()
+                yield payload
+        finally:
+            for worker in workers.values():
+                worker.cancel()
+
+    @staticmethod
+    def _timeout(
+        winner: Optional[str], now: float, deadline: float
+    ) -> LLMTimeoutError:
+        metrics.increment(MetricNames.LLM_TIMEOUTS)
+        if now >= deadline:
+            return LLMTimeoutError("LLM call exceeded its total deadline")
+        if winner is None:
+            return LLMTimeoutError("LLM call timed out waiting for the first token")
+        return LLMTimeoutError("LLM stream stalled between tokens")
+
+
+ttft = LatencyTracker()
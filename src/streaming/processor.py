@@ -5,9 +5,11 @@ from openai.types.chat.chat_completion_chunk import (
     ChatCompletionChunk,
     ChoiceDeltaToolCall,
 )
+from openai.types.completion_usage import CompletionUsage
 from pydantic import BaseModel, Field
 from streamlit.delta_generator import DeltaGenerator
 
+from src.core.profiling import turn_profiler
 from src.models.streaming import ToolCall
 
 
@@ -15,10 +17,12 @@ class StreamProcessor(BaseModel):
     content_chunks: list[str] = Field(default_factory=list)
     tool_calls: dict[str, ToolCall] = Field(default_factory=dict)
     response_placeholder: Optional[DeltaGenerator] = Field(default=None)
+    usage: Optional[CompletionUsage] = Field(default=None)
 
     class Config:
         arbitrary_types_allowed = True
 
+    @turn_profiler.section("process_stream")
     def process_stream(
         self,
         stream: Generator[dict, None, None],
@@ -28,6 +32,8 @@ class StreamProcessor(BaseModel):
 
         for token in stream:
             openai_response: ChatCompletionChunk = token["raw_response"]
+            if openai_response.usage is not None:
+                self.usage = openai_response.usage
             if not openai_response.choices:
                 continue
 
@@ -66,6 +72,12 @@ class StreamProcessor(BaseModel):
     def assistant_response(self) -> str:
         return "".join(self.content_chunks)
 
+    @property
+    def cached_tokens(self) -> int:
+        if self.usage is None or self.usage.prompt_tokens_details is None:
+            return 0
+        return self.usage.prompt_tokens_details.cached_tokens or 0
+
     @property
     def has_tool_calls(self) -> bool:
         return bool(self.tool_calls)
@@ -0,0 +1,243 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Iterator
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.streaming.deadline import LLMCallError
+from src.utils.constants import MetricNames
+
+
+class LLMAdmissionError(LLMCallError):
+    """Raised when an LLM call waits too long to be admitted."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity < 1:
+            msg = f"Invalid token bucket: rate {rate}/s, capacity {capacity}."
+            raise ValueError(msg)
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        refilled = self.tokens + (now - self.updated) * self.rate
+        self.tokens = min(self.capacity, refilled)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class _ApiKeyQueue:
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.flows: OrderedDict[str, deque[int]] = OrderedDict()
+        self.retries: set[int] = set()
+
+    def head(self, can_admit: bool) -> int | None:
+        """Returns the ticket to serve next, the first ticket of the oldest flow.
+
+        Retries of admitted calls already hold a slot, so they're served even
+        while no new call can be admitted.
+        """
+
+        for tickets in self.flows.values():
+            if can_admit or tickets[0] in self.retries:
+                return tickets[0]
+        return None
+
+
+class Admission:
+    """An admitted call, which takes a token for each extra upstream request.
+
+    Attributes:
+        wait: The seconds the call spent waiting in the queue.
+    """
+
+    def __init__(
+        self, scheduler: "LLMScheduler", queue: _ApiKeyQueue, flow: str, wait: float
+    ):
+        self.scheduler = scheduler
+        self.queue = queue
+        self.flow = flow
+        self.wait = wait
+
+    def acquire(self, timeout: float) -> None:
+        self.scheduler._take_token(self.queue, self.flow, timeout)
+
+    def try_acquire(self) -> bool:
+        return self.scheduler._try_take_token(self.queue)
+
+    def backoff(self, seconds: float) -> None:
+        with self.scheduler._cond:
+            self.queue.bucket.block(time.monotonic() + seconds)
+
+
+class LLMScheduler:
+    """Admits LLM calls per API key with a concurrency limit and a token bucket.
+
+    Waiting calls are grouped into flows, one per session and agent, and flows
+    are served round robin so a busy session can't starve the others. Retries
+    of an admitted call queue for their token in the call's flow, hedged
+    requests only take tokens no waiting flow needs, and a rate limited call
+    holds back the whole API key.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate_per_second: float,
+        burst: float,
+        max_queue_wait: float,
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_queue_wait = max_queue_wait
+        self._cond = threading.Condition()
+        self._keys: dict[str, _ApiKeyQueue] = {}
+        self._tickets = itertools.count()
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+    @contextmanager
+    def slot(
+        self, api_key: str, session_id: str, agent_id: str
+    ) -> Iterator[Admission]:
+        """Waits for a turn to call the LLM and holds it for the whole call.
+
+        Yields:
+            Admission: Rate limits the call's retries and reports its queue wait.
+
+        Raises:
+            LLMAdmissionError: If the call isn't admitted within the max queue wait.
+        """
+
+        key_id = self._key_id(api_key)
+        flow = f"{session_id}:{agent_id}"
+        started = time.monotonic()
+        deadline = started + self.max_queue_wait
+
+        with self._cond:
+            queue = self._keys.setdefault(
+                key_id, _ApiKeyQueue(self.rate_per_second, self.burst)
+            )
+            ticket = next(self._tickets)
+            queue.flows.setdefault(flow, deque()).append(ticket)
+            try:
+                self._wait_for_turn(queue, ticket, deadline)
+            except LLMAdmissionError:
+                self._remove_ticket(queue, flow, ticket)
+                metrics.increment(MetricNames.SCHEDULER_REJECTED)
+                raise
+
+            self._serve(queue, flow)
+            queue.in_flight += 1
+
+        wait = time.monotonic() - started
+        metrics.observe(MetricNames.SCHEDULER_QUEUE_WAIT, wait)
+        try:
+            yield Admission(self, queue, flow, wait)
+        finally:
+            with self._cond:
+                queue.in_flight -= 1
+                self._cond.notify_all()
+
+    def _wait_for_turn(
+        self, queue: _ApiKeyQueue, ticket: int, deadline: float
+    ) -> None:
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                raise LLMAdmissionError("Too many requests in progress, try again.")
+
+            timeout = deadline - now
+            if queue.head(queue.in_flight < self.max_concurrency) == ticket:
+                refill = queue.bucket.wait_time(now)
+                if refill == 0:
+                    return
+                timeout = min(timeout, refill)
+            self._cond.wait(timeout)
+
+    def _take_token(self, queue: _ApiKeyQueue, flow: str, timeout: float) -> None:
+        """Waits in the call's flow for a token for another upstream request.
+
+        The ticket goes behind the flow's other retries but ahead of its waiting
+        calls, which can't be admitted before this call ends anyway.
+        """
+
+        deadline = time.monotonic() + min(timeout, self.max_queue_wait)
+        with self._cond:
+            ticket = next(self._tickets)
+            tickets = queue.flows.setdefault(flow, deque())
+            retries = itertools.takewhile(lambda t: t in queue.retries, tickets)
+            tickets.insert(sum(1 for _ in retries), ticket)
+            queue.retries.add(ticket)
+            try:
+                self._wait_for_turn(queue, ticket, deadline)
+            except LLMAdmissionError:
+                self._remove_ticket(queue, flow, ticket)
+                metrics.increment(MetricNames.SCHEDULER_REJECTED)
+                raise LLMAdmissionError("Rate limit reached, try again.") from None
+            finally:
+                queue.retries.discard(ticket)
+            self._serve(queue, flow)
+
+    def _try_take_token(self, queue: _ApiKeyQueue) -> bool:
+        """Takes a token right away, unless a waiting flow could use it."""
+
+        with self._cond:
+            if queue.head(queue.in_flight < self.max_concurrency) is not None:
+                return False
+            if queue.bucket.wait_time(time.monotonic()) > 0:
+                return False
+            queue.bucket.take()
+            return True
+
+    def _serve(self, queue: _ApiKeyQueue, flow: str) -> None:
+        """Takes a token for the head ticket of `flow` and rotates the flows."""
+
+        tickets = queue.flows[flow]
+        tickets.popleft()
+        if tickets:
+            queue.flows.move_to_end(flow)
+        else:
+            del queue.flows[flow]
+        queue.bucket.take()
+        self._cond.notify_all()
+
+    def _remove_ticket(self, queue: _ApiKeyQueue, flow: str, ticket: int) -> None:
+        tickets = queue.flows.get(flow)
+        if tickets is None:
+            return
+        tickets.remove(ticket)
+        if not tickets:
+            del queue.flows[flow]
+        self._cond.notify_all()
+
+
+llm_scheduler = LLMScheduler(
+    settings.LLM_MAX_CONCURRENCY_PER_KEY,
+    settings.LLM_RATE_LIMIT_PER_SECOND,
+    settings.LLM_RATE_LIMIT_BURST,
+    settings.LLM_MAX_QUEUE_WAIT,
+)
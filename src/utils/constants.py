@@ -2,6 +2,7 @@ from datetime import date, datetime
 from enum import StrEnum
 
 AGENT_DB_FILE = "agents.json"
+SHARED_CACHE_FILE = "intake_cache.sqlite3"
 
 
 USER_MESSAGE = "user"
@@ -18,6 +19,12 @@ class StateVariables(StrEnum):
     FORM_DATA = "form_data"
     MODEL_FIELDS = "model_fields"
     FORM_KEY = "form_key"
+    LAST_VALIDATION = "last_validation"
+    CURRENT_SECTION = "current_section"
+    SERIALIZED_HISTORY = "serialized_history"
+    TURN_USAGE = "turn_usage"
+    SESSION_ID = "session_id"
+    UPLOAD_KEY = "upload_key"
 
 
 class FormPromptVariables(StrEnum):
@@ -44,6 +51,35 @@ NODE_STATUS = "status"
 SUCCESS = "SUCCESS"
 
 
+class MetricNames(StrEnum):
+    FORM_SUBMISSIONS = "form.submissions"
+    FORM_VALIDATION_FAILURES = "form.validation_failures"
+    FORM_REPAIR_TURNS = "form.repair_turns"
+    FORM_REPAIR_SUCCESSES = "form.repair_successes"
+    FORM_REPAIR_CHARS_SAVED = "form.repair_prompt_chars_saved"
+    LLM_TTFT = "llm.ttft_seconds"
+    LLM_RETRIES = "llm.retries"
+    LLM_TIMEOUTS = "llm.timeouts"
+    LLM_HEDGED_REQUESTS = "llm.hedged_requests"
+    ROUTER_PREFIX = "router"
+    PROMPT_TOKENS = "llm.prompt_tokens"
+    CACHED_PROMPT_TOKENS = "llm.cached_prompt_tokens"
+    SCHEDULER_QUEUE_WAIT = "scheduler.queue_wait_seconds"
+    SCHEDULER_REJECTED = "scheduler.rejected"
+    IMAGE_BYTES_IN = "images.bytes_in"
+    IMAGE_BYTES_OUT = "images.payload_bytes_out"
+    IMAGE_CACHE_HITS = "images.cache_hits"
+    TRACE_SPANS_EXPORTED = "tracing.spans_exported"
+    TRACE_SPANS_DROPPED = "tracing.spans_dropped"
+    TRACE_SPANS_SAMPLED_OUT = "tracing.spans_sampled_out"
+    TRACE_EXPORT_ERRORS = "tracing.export_errors"
+
+
+class PromptLayouts(StrEnum):
+    STANDARD = "standard"
+    CACHE_FRIENDLY = "cache_friendly"
+
+
 class PromptNames(StrEnum):
     FORM_PROMPT = "Intake Agent"
     EVALUATION_WORKFLOW = "Intake Form Evaluation"
@@ -87,3 +123,8 @@ CHAT_MARKDOWN_STYLE = """
 
 
 OPENAI_MODELS = ["gpt-4o-mini", "gpt-4o"]
+
+QUEUE_WAIT_NOTICE = 0.5
+
+IMAGE_UPLOAD_TYPES = ["png", "jpg", "jpeg", "webp"]
+IMAGE_PREVIEW_WIDTH = 320
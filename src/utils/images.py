@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import io
+import math
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.models.message import Message, MessageContentTypes
+from src.utils.constants import MetricNames
+
+JPEG_MEDIA_TYPE = "image/jpeg"
+MISSING_IMAGE_TEXT = "[image no longer available]"
+
+
+class ImageError(ValueError):
+    """Raised when an upload can't be decoded as an image."""
+
+
+class ImagePayloadCache:
+    """In-memory LRU of encoded image payloads, bounded by their total size.
+
+    Uploads are often ID or insurance card photos, so payloads are never
+    written to disk and are dropped when their conversation is cleared. The
+    same image uploaded in several sessions shares one payload, which is kept
+    until every session using it discarded it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._lock = threading.Lock()
+        self._payloads: OrderedDict[str, str] = OrderedDict()
+        self._owners: dict[str, set[str]] = {}
+
+    def get(self, ref: str) -> Optional[str]:
+        with self._lock:
+            payload = self._payloads.get(ref)
+            if payload is not None:
+                self._payloads.move_to_end(ref)
+            return payload
+
+    def claim(self, ref: str, owner: Optional[str] = None) -> bool:
+        """Records `owner` as a user of a cached payload.
+
+        Returns:
+            bool: Whether the payload is cached.
+        """
+
+        with self._lock:
+            if ref not in self._payloads:
+                return False
+            self._payloads.move_to_end(ref)
+            if owner is not None:
+                self._owners.setdefault(ref, set()).add(owner)
+            return True
+
+    def put(self, ref: str, payload: str, owner: Optional[str] = None) -> None:
+        with self._lock:
+            if owner is not None:
+                self._owners.setdefault(ref, set()).add(owner)
+            if ref in self._payloads:
+                return
+            self._payloads[ref] = payload
+            self._size += len(payload)
+            while self._size > self.max_bytes and len(self._payloads) > 1:
+                evicted_ref, evicted = self._payloads.popitem(last=False)
+                self._owners.pop(evicted_ref, None)
+                self._size -= len(evicted)
+
+    def discard(self, refs: Iterable[str], owner: Optional[str] = None) -> None:
+        """Drops the payloads `owner` no longer uses, unless another owner does."""
+
+        with self._lock:
+            for ref in refs:
+                owners = self._owners.get(ref, set())
+                owners.discard(owner)
+                if owners:
+                    continue
+                self._owners.pop(ref, None)
+                payload = self._payloads.pop(ref, None)
+                if payload is not None:
+                    self._size -= len(payload)
+
+
+image_payloads = ImagePayloadCache(settings.IMAGE_CACHE_MAX_BYTES)
+
+
+def encode_image(upload: io.BytesIO, session_id: Optional[str] = None) -> str:
+    """Downscales and recompresses an uploaded image, caching it by content hash.
+
+    The upload is hashed through its buffer and decoded straight from the
+    file object, so the raw bytes are never copied. JPEGs are decoded at a
+    reduced scale when they're much larger than the target size.
+
+    Args:
+        upload: An in-memory upload, e.g. a Streamlit `UploadedFile`.
+        session_id: The session the image is uploaded in, it keeps the payload
+            cached until the session discards it.
+
+    Returns:
+        str: The reference to keep in the conversation history.
+
+    Raises:
+        ImageError: If the upload isn't a readable image or exceeds Pillow's
+            decompression bomb limit.
+    """
+
+    with upload.getbuffer() as buffer:
+        digest = hashlib.sha256(buffer).hexdigest()
+        metrics.increment(MetricNames.IMAGE_BYTES_IN, buffer.nbytes)
+    ref = f"{digest}:{settings.IMAGE_MAX_SIDE}:{settings.IMAGE_JPEG_QUALITY}"
+
+    if image_payloads.claim(ref, session_id):
+        metrics.increment(MetricNames.IMAGE_CACHE_HITS)
+        return ref
+
+    upload.seek(0)
+    max_side = settings.IMAGE_MAX_SIDE
+    encoded = io.BytesIO()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(upload) as image:
+                scale = min(max_side / max(image.size), 1)
+                image.draft("RGB", tuple(math.ceil(n * scale) for n in image.size))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((max_side, max_side))
+                if image.mode != "RGB":
+                    image = image.convert("RGB")
+                image.save(
+                    encoded, "JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True
+                )
+    except (
+        UnidentifiedImageError,
+        Image.DecompressionBombError,
+        Image.DecompressionBombWarning,
+    ) as e:
+        raise ImageError(str(e)) from e
+    except OSError as e:
+        raise ImageError(f"The image is damaged or truncated ({e})") from e
+
+    payload = (
+        f"data:{JPEG_MEDIA_TYPE};base64,"
+        f"{base64.b64encode(encoded.getbuffer()).decode('ascii')}"
+    )
+    metrics.increment(MetricNames.IMAGE_BYTES_OUT, len(payload))
+    image_payloads.put(ref, payload, session_id)
+    return ref
+
+
+def get_image_payload(ref: str) -> Optional[str]:
+    return image_payloads.get(ref)
+
+
+def get_image_bytes(ref: str) -> Optional[bytes]:
+    payload = get_image_payload(ref)
+    if payload is None:
+        return None
+    return base64.b64decode(payload.split(",", 1)[1])
+
+
+def serialize_message(message: Message, exclude_none: bool = False) -> dict:
+    """Serializes a message for the prompt, keeping image references as is."""
+
+    data = message.model_dump(exclude_none=exclude_none)
+    for content in data.get("content") or []:
+        if content["type"] != MessageContentTypes.IMAGE:
+            content.pop("image_ref", None)
+    return data
+
+
+def resolve_images(data: dict) -> dict:
+    """Replaces the image references of a serialized message with their payloads.
+
+    Messages without images are returned as is, others are copied so the
+    serialized form can be kept without holding on to the payloads.
+    """
+
+    contents = data.get("content") or []
+    if not any(content["type"] == MessageContentTypes.IMAGE for content in contents):
+        return data
+    return {**data, "content": [_resolve_image(content) for content in contents]}
+
+
+def _resolve_image(content: dict) -> dict:
+    if content["type"] != MessageContentTypes.IMAGE:
+        return content
+
+    image_ref = content.get("image_ref")
+    payload = get_image_payload(image_ref) if image_ref else None
+    if payload is None:
+        return {"type": MessageContentTypes.TEXT, "text": MISSING_IMAGE_TEXT}
+    return {"type": "image_url", "image_url": {"url": payload}}
+
+
+def history_image_refs(messages: Iterable[Message]) -> list[str]:
+    return [
+        content.image_ref
+        for message in messages
+        for content in message.content or []
+        if content.type == MessageContentTypes.IMAGE and content.image_ref
+    ]
+
+
+def to_prompt_message(message: Message, exclude_none: bool = False) -> dict:
+    """Serializes a message for the prompt, resolving image references to payloads."""
+
+    return resolve_images(serialize_message(message, exclude_none))
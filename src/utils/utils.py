@@ -1,35 +1,186 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
+import tempfile
+import threading
 from collections.abc import Sequence
 from copy import deepcopy
-from typing import Any, Optional
+from typing import Any, Optional, get_args
 
-from pydantic import BaseModel, Field, create_model
+from pydantic import BaseModel, Field, ValidationError, create_model
 
-from src.models.agent import Agent, FormField
+from src.core.shared_cache import shared_cache
+from src.models.agent import Agent, FormField, FormSection
+from src.models.form import MISSING_ERROR_TYPE, FieldError, FormValidationResult
 from src.models.streaming import ToolCall
 from src.utils.constants import AGENT_DB_FILE, FIELD_TYPES_MAPPER
 
+AGENTS_VERSION = "agents"
+AGENTS_CATALOG_KEY = "agents:catalog"
+AGENT_KEY_PREFIX = "agent:"
 
-def load_agents(as_dict: bool = False) -> list[Agent] | dict:
+_agent_catalog: Optional[tuple[int, tuple[int, int], list[Agent]]] = None
+_agent_objects: dict[str, Agent] = {}
+# Streamlit sessions run in threads of the same process, a refresh that prunes
+# `_agent_objects` must not interleave with another session's. Reentrant as a
+# refresh may republish the catalog.
+_agents_lock = threading.RLock()
+
+
+def _read_agents_file() -> list[dict]:
     if os.path.exists(AGENT_DB_FILE):
         with open(AGENT_DB_FILE, "r") as f:
             try:
-                agents = json.load(f)
-                return [Agent(**agent) for agent in agents] if not as_dict else agents
+                return json.load(f)
             except json.JSONDecodeError:
                 return []
     return []
 
 
+def _agents_file_signature() -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(AGENT_DB_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_hash(obj: Any) -> str:
+    return hashlib.sha256(canonical_json(obj).encode()).hexdigest()
+
+
+def publish_agent_catalog(agents: list[dict]) -> list[str]:
+    """Publishes the agent records to the shared cache and bumps its version.
+
+    Records of agents that are no longer stored are deleted in the same write.
+
+    Returns:
+        list[str]: The cache keys of the agents, in store order.
+    """
+
+    keys = [f"{AGENT_KEY_PREFIX}{content_hash(agent)}" for agent in agents]
+    records = dict(zip(keys, agents))
+    entries = {key: canonical_json(agent) for key, agent in records.items()}
+    entries[AGENTS_CATALOG_KEY] = json.dumps(
+        {"signature": _agents_file_signature(), "agents": keys}
+    )
+    shared_cache.set_many(entries, bump=AGENTS_VERSION, prune_prefix=AGENT_KEY_PREFIX)
+    with _agents_lock:
+        for key, agent in records.items():
+            _agent_objects.setdefault(key, Agent(**agent))
+    return keys
+
+
+def load_agents(as_dict: bool = False) -> list[Agent] | dict:
+    """Loads the stored agents.
+
+    Parsed agents are kept per process and shared with the other workers through
+    the shared cache, so a save in one worker only costs the others a version
+    check plus fetching the changed records.
+    """
+
+    global _agent_catalog
+
+    if as_dict:
+        return _read_agents_file()
+
+    signature = _agents_file_signature()
+    if signature is None:
+        return []
+
+    version = shared_cache.version(AGENTS_VERSION)
+    if _agent_catalog is not None and _agent_catalog[:2] == (version, signature):
+        return list(_agent_catalog[2])
+
+    with _agents_lock:
+        catalog = json.loads(shared_cache.get(AGENTS_CATALOG_KEY) or "null")
+        if catalog is None or tuple(catalog["signature"] or ()) != signature:
+            keys = publish_agent_catalog(_read_agents_file())
+            version = shared_cache.version(AGENTS_VERSION)
+        else:
+            keys = catalog["agents"]
+            missing = [key for key in keys if key not in _agent_objects]
+            fetched = shared_cache.get_many(missing)
+            for key, value in fetched.items():
+                _agent_objects[key] = Agent(**json.loads(value))
+            if len(fetched) < len(missing):
+                # Pruned by a newer catalog published since it was read.
+                keys = publish_agent_catalog(_read_agents_file())
+                version = shared_cache.version(AGENTS_VERSION)
+
+        for key in _agent_objects.keys() - set(keys):
+            del _agent_objects[key]
+        agents = [_agent_objects[key] for key in keys]
+        _agent_catalog = (version, signature, agents)
+    return list(agents)
+
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        "w", dir=directory, suffix=".tmp", delete=False
+    ) as f:
+        json.dump(data, f, indent=2)
+    os.replace(f.name, path)
+
+
 def save_agent(agent_data: dict) -> None:
+    save_agents([agent_data])
+
+
+def save_agents(agents_data: list[dict], replace: bool = False) -> None:
+    """Writes a batch of agents to the agent store in a single atomic rewrite.
+
+    Args:
+        agents_data: The agents to add.
+        replace: Whether agents with an existing id replace the stored ones.
+            Otherwise a duplicate id raises a ValueError and nothing is written.
+    """
+
     agents = load_agents(as_dict=True)
-    agents.append(agent_data)
+    positions = {agent["id"]: idx for idx, agent in enumerate(agents)}
+    for agent_data in agents_data:
+        idx = positions.get(agent_data["id"])
+        if idx is None:
+            positions[agent_data["id"]] = len(agents)
+            agents.append(agent_data)
+        elif replace:
+            agents[idx] = agent_data
+        else:
+            msg = f"Agent with id '{agent_data['id']}' already exists."
+            raise ValueError(msg)
 
-    with open(AGENT_DB_FILE, "w") as f:
-        json.dump(agents, f, indent=2)
+    _write_json_atomic(AGENT_DB_FILE, agents)
+    publish_agent_catalog(agents)
+
+
+def validate_agent_record(record: dict) -> Agent:
+    """Validates a raw agent definition, including its field types and sections.
+
+    Raises:
+        ValueError: If the definition is not a valid agent.
+    """
+
+    agent = Agent(**record)
+    keys = set()
+    for field in agent.fields:
+        if field.type not in FIELD_TYPES_MAPPER:
+            msg = f"Field '{field.name}' has unknown type '{field.type}'."
+            raise ValueError(msg)
+        if field_key(field.name) in keys:
+            msg = f"Field '{field.name}' is defined more than once."
+            raise ValueError(msg)
+        keys.add(field_key(field.name))
+
+    names = {field.name for field in agent.fields}
+    for section in agent.sections or []:
+        unknown = set(section.fields) - names
+        if unknown:
+            msg = f"Section '{section.name}' references unknown fields: {unknown}."
+            raise ValueError(msg)
+    return agent
 
 
 def model_fields_to_string(model: type[BaseModel]) -> str:
@@ -232,23 +383,274 @@ def convert_pydantic_to_openai_tool(
     }
 
 
-def fetch_form_data(tool_calls: list[ToolCall], model: type[BaseModel]) -> dict:
+def _sort_keys(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: _sort_keys(obj[k]) for k in sorted(obj)}
+    if isinstance(obj, list):
+        return [_sort_keys(el) for el in obj]
+    return obj
+
+
+def canonical_json(obj: Any) -> str:
+    """Serializes to a byte-stable JSON string so equal inputs share a cache prefix."""
+
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+
+_TOOL_CACHE: dict[str, dict[str, Any]] = {}
+_MODEL_HASHES: dict[type[BaseModel], str] = {}
+
+
+def fields_hash(fields: list[FormField]) -> str:
+    return content_hash([field.model_dump() for field in fields])
+
+
+def save_precompiled_tools(tools: dict[str, dict[str, Any]]) -> None:
+    shared_cache.set_many(
+        {f"tool:{key}": canonical_json(tool) for key, tool in tools.items()}
+    )
+
+
+def get_canonical_tool(model: type[BaseModel]) -> dict[str, Any]:
+    """Returns the model's tool definition with recursively sorted keys.
+
+    Definitions of cached form models are kept by the hash of their fields, so
+    every turn sends the same object. Tools built by other workers or
+    precompiled by the agents CLI are read from the shared cache instead of
+    being rebuilt. Other models are converted on every call.
+    """
+
+    key = _MODEL_HASHES.get(model)
+    if key is None:
+        return build_canonical_tool(model)
+    if key in _TOOL_CACHE:
+        return _TOOL_CACHE[key]
+
+    cached = shared_cache.get(f"tool:{key}")
+    if cached is not None:
+        _TOOL_CACHE[key] = json.loads(cached)
+    else:
+        _TOOL_CACHE[key] = build_canonical_tool(model)
+        save_precompiled_tools({key: _TOOL_CACHE[key]})
+    return _TOOL_CACHE[key]
+
+
+def build_canonical_tool(model: type[BaseModel]) -> dict[str, Any]:
+    return _sort_keys(convert_pydantic_to_openai_tool(model))
+
+
+def precompile_agent_tools(
+    agent: Agent, auto_chunk_threshold: int, chunk_size: int
+) -> dict[str, dict[str, Any]]:
+    """Builds the tool definitions of the agent's form and sections.
+
+    Neither the process nor the shared caches are touched, so it can run in
+    worker processes and the caller saves all the tools in one batch.
+
+    Returns:
+        dict: The tool definitions keyed by the hash of the fields they cover.
+    """
+
+    field_groups = [agent.fields] + [
+        get_section_fields(agent, section)
+        for section in resolve_sections(agent, auto_chunk_threshold, chunk_size)
+    ]
+    return {
+        fields_hash(fields): build_canonical_tool(create_dynamic_model(fields))
+        for fields in field_groups
+    }
+
+
+def build_cacheable_form_details(goal: str, model: type[BaseModel]) -> str:
+    return canonical_json(
+        {
+            "goal": goal,
+            "fields": get_canonical_tool(model)["function"]["parameters"],
+        }
+    )
+
+
+def validate_form_data(
+    tool_calls: list[ToolCall], model: type[BaseModel]
+) -> FormValidationResult:
+    """Validates the submitted tool arguments against the form model.
+
+    Returns:
+        FormValidationResult: The coerced values when valid, otherwise the raw
+            submitted data and the per-field errors.
+    """
+
     for tool_call in tool_calls:
-        if tool_call.function.name == model.__name__:
-            return json.loads(tool_call.function.arguments)
-    return {}
+        if tool_call.function.name != model.__name__:
+            continue
+
+        arguments = tool_call.function.arguments or "{}"
+        try:
+            data = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            return FormValidationResult(
+                submitted=True,
+                errors=[FieldError(field="", type="json_invalid", message=str(e))],
+            )
+
+        return validate_form_values(data, model)
+
+    return FormValidationResult()
+
+
+def validate_form_values(data: dict, model: type[BaseModel]) -> FormValidationResult:
+    try:
+        instance = model.model_validate(data)
+    except ValidationError as e:
+        errors = [
+            FieldError(
+                field=str(error["loc"][0]) if error["loc"] else "",
+                type=error["type"],
+                message=error["msg"],
+            )
+            for error in e.errors()
+        ]
+        return FormValidationResult(submitted=True, data=data, errors=errors)
+
+    return FormValidationResult(
+        submitted=True, data=instance.model_dump(mode="json")
+    )
+
+
+def field_key(field_name: str) -> str:
+    return field_name.lower().replace(" ", "_")
 
 
 def create_dynamic_model(fields: list[FormField]) -> type[BaseModel]:
     field_definitions = {}
     for field in fields:
         python_type = FIELD_TYPES_MAPPER[field.type]
-        field_definitions[field.name.lower().replace(" ", "_")] = (
+        optional = {"default": None} if type(None) in get_args(python_type) else {}
+        field_definitions[field_key(field.name)] = (
             python_type,
             Field(
                 description=field.description,
                 example=field.example if field.example else None,
+                **optional,
             ),
         )
 
     return create_model("SubmitIntake", **field_definitions)
+
+
+_FORM_MODEL_CACHE: dict[tuple[str, str], type[BaseModel]] = {}
+
+
+def _get_cached_model(agent_id: str, fields: list[FormField]) -> type[BaseModel]:
+    """Returns the form model of the fields, keyed like their tool definition.
+
+    Every attribute of the fields, examples included, is part of the key, so
+    an edited field never reuses a stale model.
+    """
+
+    digest = fields_hash(fields)
+    key = (agent_id, digest)
+    if key not in _FORM_MODEL_CACHE:
+        model = create_dynamic_model(fields)
+        _FORM_MODEL_CACHE[key] = model
+        _MODEL_HASHES[model] = digest
+    return _FORM_MODEL_CACHE[key]
+
+
+def get_form_model(agent: Agent) -> type[BaseModel]:
+    """Returns the agent's form model, building its validator only once per agent."""
+
+    return _get_cached_model(agent.id, agent.fields)
+
+
+def get_section_fields(agent: Agent, section: FormSection) -> list[FormField]:
+    names = set(section.fields)
+    return [field for field in agent.fields if field.name in names]
+
+
+def get_section_model(agent: Agent, section: FormSection) -> type[BaseModel]:
+    return _get_cached_model(agent.id, get_section_fields(agent, section))
+
+
+def resolve_sections(
+    agent: Agent, auto_chunk_threshold: int, chunk_size: int
+) -> list[FormSection]:
+    """Returns the sections the agent's form is collected in.
+
+    Uses the agent's own field groups when defined, otherwise large forms are
+    split into chunks of `chunk_size` fields. Small forms aren't sectioned.
+
+    Returns:
+        list[FormSection]: The sections in collection order, empty if the form is
+            collected in a single pass.
+    """
+
+    if agent.sections:
+        grouped = {name for section in agent.sections for name in section.fields}
+        remaining = [field.name for field in agent.fields if field.name not in grouped]
+        sections = [section for section in agent.sections if section.fields]
+        if remaining:
+            sections.append(FormSection(name="Other details", fields=remaining))
+        return sections
+
+    if len(agent.fields) <= auto_chunk_threshold:
+        return []
+
+    chunks = [
+        agent.fields[i : i + chunk_size]
+        for i in range(0, len(agent.fields), chunk_size)
+    ]
+    return [
+        FormSection(
+            name=f"Part {idx} of {len(chunks)}",
+            fields=[field.name for field in chunk],
+        )
+        for idx, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def create_repair_model(
+    agent_id: str, fields: list[FormField], failing_fields: list[str]
+) -> type[BaseModel]:
+    """Returns a form model of only the submitted fields that failed validation."""
+
+    return _get_cached_model(
+        agent_id,
+        [field for field in fields if field_key(field.name) in failing_fields],
+    )
+
+
+def format_repair_request(result: FormValidationResult) -> str:
+    lines = ["The submitted form had invalid values for the following fields:"]
+    for error in result.repairable_errors:
+        value = result.data.get(error.field, None)
+        lines.append(f"- {error.field}: got {value!r} ({error.message})")
+    lines.append(
+        "Call the tool again with corrected values for only these fields, "
+        "keeping the information the user already gave."
+    )
+    return "\n".join(lines)
+
+
+def format_validation_feedback(result: FormValidationResult) -> str:
+    """Describes why a submission was rejected, for the next conversation turn.
+
+    Missing fields are never repaired, the model is told to ask the user for
+    them rather than fill them in.
+    """
+
+    lines = []
+    if result.repairable_errors:
+        lines.append(format_repair_request(result))
+
+    if result.missing_fields:
+        lines.append(
+            "The following required fields weren't provided: "
+            + ", ".join(result.missing_fields)
+            + ". Ask the user for them, don't guess or make up values."
+        )
+
+    for error in result.errors:
+        if error.type != MISSING_ERROR_TYPE and error.field not in result.data:
+            lines.append(f"The form couldn't be read: {error.message}")
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pytest
+
+os.environ.setdefault("PROMPTLAYER_API_KEY", "test-key")
+
+from src.core.shared_cache import shared_cache  # noqa: E402
+from src.models.agent import Agent, FormField  # noqa: E402
+from src.utils.images import image_payloads  # noqa: E402
+from tests.fake_collector import FakeCollector  # noqa: E402
+from tests.fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Gives each test its own agents file and shared cache, with cold caches."""
+
+    from src.utils import utils
+
+    monkeypatch.setattr(utils, "AGENT_DB_FILE", str(tmp_path / "agents.json"))
+    monkeypatch.setattr(utils, "_agent_catalog", None)
+    monkeypatch.setattr(utils, "_agent_objects", {})
+    monkeypatch.setattr(utils, "_FORM_MODEL_CACHE", {})
+    monkeypatch.setattr(utils, "_MODEL_HASHES", {})
+    monkeypatch.setattr(utils, "_TOOL_CACHE", {})
+    monkeypatch.setattr(image_payloads, "_payloads", OrderedDict())
+    monkeypatch.setattr(image_payloads, "_size", 0)
+    monkeypatch.setattr(image_payloads, "_owners", {})
+    monkeypatch.setattr(shared_cache, "path", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(shared_cache, "_local", threading.local())
+    return tmp_path
+
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAIServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def collector():
+    server = FakeCollector().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_agent():
+    return _make_agent
+
+
+def _make_agent(n_fields: int = 3, **overrides) -> Agent:
+    fields = [
+        FormField(
+            name=f"Field {i}",
+            type="Whole number" if i % 3 == 1 else "Text",
+            description=f"Description of field {i}",
+        )
+        for i in range(n_fields)
+    ]
+    return Agent(
+        **{
+            "id": "agent-1",
+            "name": "Test agent",
+            "goal": "Collect the test details",
+            "fields": fields,
+            "created_at": "2025-01-01T00:00:00",
+            **overrides,
+        }
+    )
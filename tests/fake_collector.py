@@ -0,0 +1,70 @@
+"""A local stand-in for PromptLayer's spans-bulk endpoint.
+
+Records every posted payload with its headers. Requests can be held until
+`release` is set, or answered with an HTTP error, to exercise the exporter's
+backpressure and error handling.
+"""
+
+import json
+import threading
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeCollector:
+    def __init__(self):
+        self.payloads: list[dict] = []
+        self.headers: list[Message] = []
+        self.status = 200
+        self.hold = False
+        self.received = threading.Event()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/spans-bulk"
+
+    @property
+    def spans(self) -> list[dict]:
+        with self._lock:
+            return [span for payload in self.payloads for span in payload["spans"]]
+
+    def start(self) -> "FakeCollector":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.release.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _record(self, payload: dict, headers: Message) -> None:
+        with self._lock:
+            self.payloads.append(payload)
+            self.headers.append(headers)
+        self.received.set()
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                collector._record(json.loads(body), self.headers)
+                if collector.hold:
+                    collector.release.wait()
+                self.send_response(collector.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
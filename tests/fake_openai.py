@@ -0,0 +1,140 @@
+"""A local server speaking the OpenAI streaming chat completions protocol.
+
+Each request consumes the next scripted response, so tests can inject HTTP
+errors and stalls without any network access.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+
+
+@dataclass
+class Status:
+    code: int
+    retry_after: float | None = None
+    error_code: str | None = None
+
+
+@dataclass
+class Stream:
+    tokens: list[str] = field(default_factory=lambda: ["Hello", " world"])
+    stall_after: int | None = None
+    stall: float = 0.0
+
+
+def _chunk(content: str | None, finish_reason: str | None = None) -> bytes:
+    chunk = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "delta": {"content": content} if content is not None else {},
+                "finish_reason": finish_reason,
+            }
+        ],
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+class FakeOpenAIServer:
+    def __init__(self):
+        self.script: deque[Status | Stream] = deque()
+        self.requests = 0
+        self.request_times: list[float] = []
+        self.active = 0
+        self.max_active = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def client(self) -> openai.OpenAI:
+        return openai.OpenAI(api_key="test", base_url=self.url, max_retries=0)
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.release.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def next_response(self) -> Status | Stream:
+        with self._lock:
+            self.requests += 1
+            self.request_times.append(time.monotonic())
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            return self.script.popleft() if self.script else Stream()
+
+    def finished(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                response = server.next_response()
+                try:
+                    if isinstance(response, Status):
+                        self._send_status(response)
+                    else:
+                        self._send_stream(response)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    server.finished()
+
+            def _send_status(self, response: Status) -> None:
+                error = {
+                    "message": f"HTTP {response.code}",
+                    "type": "fake",
+                    "code": response.error_code,
+                }
+                body = json.dumps({"error": error}).encode()
+                self.send_response(response.code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if response.retry_after is not None:
+                    self.send_header("Retry-After", str(response.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, response: Stream) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for idx, token in enumerate(response.tokens):
+                    if idx == response.stall_after:
+                        server.release.wait(response.stall)
+                    self.wfile.write(_chunk(token))
+                    self.wfile.flush()
+                self.wfile.write(_chunk(None, "stop"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,85 @@
+import json
+
+from src.cli import VALIDATION_CHUNK_SIZE, import_agents
+from src.core.shared_cache import shared_cache
+from src.utils.utils import fields_hash, load_agents, precompile_agent_tools
+
+
+def agent_record(idx: int) -> dict:
+    return {
+        "id": f"agent-{idx}",
+        "name": f"Agent {idx}",
+        "goal": "Collect contact details",
+        "created_at": "2025-01-01T00:00:00",
+        "fields": [
+            {"name": "Full name", "type": "Text", "description": "Legal name"},
+            {"name": "Age", "type": "Whole number", "description": "In years"},
+        ],
+    }
+
+
+def write_jsonl(path, lines: list[str]):
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_import_saves_agents_and_tools(isolated_storage):
+    path = write_jsonl(
+        isolated_storage / "agents.jsonl",
+        [json.dumps(agent_record(idx)) for idx in range(3)],
+    )
+
+    assert import_agents(path, replace=False, workers=2) == 0
+
+    agents = load_agents()
+    assert [agent.id for agent in agents] == ["agent-0", "agent-1", "agent-2"]
+    key = f"tool:{fields_hash(agents[0].fields)}"
+    assert shared_cache.get(key) is not None
+
+
+def test_import_spans_several_validation_windows(isolated_storage):
+    count = VALIDATION_CHUNK_SIZE * 2 + 5
+    path = write_jsonl(
+        isolated_storage / "agents.jsonl",
+        [json.dumps(agent_record(idx)) for idx in range(count)],
+    )
+
+    assert import_agents(path, replace=False, workers=1) == 0
+
+    assert [agent.id for agent in load_agents()] == [
+        f"agent-{idx}" for idx in range(count)
+    ]
+
+
+def test_invalid_records_are_reported_without_importing(isolated_storage, capsys):
+    bad_type = agent_record(2)
+    bad_type["fields"][0]["type"] = "Colour"
+    path = write_jsonl(
+        isolated_storage / "agents.jsonl",
+        [
+            json.dumps(agent_record(0)),
+            json.dumps([agent_record(1)]),
+            '{"name": ',
+            json.dumps(bad_type),
+            json.dumps("agent"),
+        ],
+    )
+
+    assert import_agents(path, replace=False, workers=2) == 1
+
+    errors = capsys.readouterr().err
+    assert "line 2: expected an object, got list" in errors
+    assert "line 3: invalid JSON" in errors
+    assert "line 4 (Agent 2): Field 'Full name' has unknown type" in errors
+    assert "line 5: expected an object, got str" in errors
+    assert "4 invalid agents" in errors
+    assert load_agents() == []
+
+
+def test_precompiling_tools_does_not_write_the_shared_cache(make_agent):
+    agent = make_agent(60)
+
+    tools = precompile_agent_tools(agent, auto_chunk_threshold=40, chunk_size=20)
+
+    assert len(tools) == 4
+    assert shared_cache.get_many(f"tool:{key}" for key in tools) == {}
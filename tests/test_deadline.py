@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from src.streaming.deadline import (
+    DeadlinePolicy,
+    DeadlineStream,
+    LatencyTracker,
+    LLMTimeoutError,
+    LLMUpstreamError,
+)
+from tests.fake_openai import Status, Stream
+
+POLICY = DeadlinePolicy(
+    first_token_timeout=0.5,
+    stall_timeout=0.5,
+    total_deadline=10,
+    max_retries=2,
+    retry_backoff=0.01,
+)
+
+
+def stream_workers() -> list[threading.Thread]:
+    return [t for t in threading.enumerate() if t.name.startswith("llm-stream-")]
+
+
+def wait_for_workers(timeout: float = 2.0) -> list[threading.Thread]:
+    end = time.monotonic() + timeout
+    while stream_workers() and time.monotonic() < end:
+        time.sleep(0.02)
+    return stream_workers()
+
+
+def text(tokens) -> str:
+    return "".join(
+        chunk.choices[0].delta.content or "" for chunk in tokens if chunk.choices
+    )
+
+
+@pytest.fixture
+def deadline_stream():
+    return DeadlineStream(POLICY, LatencyTracker())
+
+
+def openai_factory(server, timeout=None):
+    client = server.client()
+    return lambda: client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "hi"}],
+        stream=True,
+        timeout=timeout,
+    )
+
+
+def test_stream_completes(fake_openai, deadline_stream):
+    tokens = deadline_stream.stream(openai_factory(fake_openai))
+
+    assert text(tokens) == "Hello world"
+    assert fake_openai.requests == 1
+
+
+def test_stall_after_first_token_closes_the_response(fake_openai, deadline_stream):
+    fake_openai.script.append(Stream(tokens=["a", "b", "c"], stall_after=1, stall=30))
+    started = time.monotonic()
+
+    with pytest.raises(LLMTimeoutError, match="stalled"):
+        list(deadline_stream.stream(openai_factory(fake_openai)))
+
+    assert time.monotonic() - started < 2
+    assert fake_openai.requests == 1
+    assert wait_for_workers() == []
+
+
+def test_first_token_timeout_is_retried(fake_openai, deadline_stream):
+    fake_openai.script.extend([Stream(stall_after=0, stall=30), Stream()])
+
+    tokens = deadline_stream.stream(openai_factory(fake_openai))
+
+    assert text(tokens) == "Hello world"
+    assert fake_openai.requests == 2
+    assert wait_for_workers() == []
+
+
+def test_generator_streams_stop_on_their_read_timeout(fake_openai, deadline_stream):
+    """Generators, like PromptLayer's stream, can only be unblocked by a timeout."""
+
+    fake_openai.script.append(Stream(stall_after=0, stall=30))
+    factory = openai_factory(fake_openai, timeout=POLICY.read_timeout)
+    deadline_stream.policy = POLICY.model_copy(update={"max_retries": 0})
+
+    with pytest.raises(LLMTimeoutError):
+        list(deadline_stream.stream(lambda: (chunk for chunk in factory())))
+
+    assert wait_for_workers(timeout=POLICY.read_timeout + 2) == []
+
+
+@pytest.mark.parametrize("code", [400, 401, 403, 404])
+def test_client_errors_are_not_retried(fake_openai, deadline_stream, code):
+    fake_openai.script.append(Status(code))
+
+    with pytest.raises(LLMUpstreamError) as error:
+        list(deadline_stream.stream(openai_factory(fake_openai)))
+
+    assert not error.value.retryable
+    assert fake_openai.requests == 1
+
+
+@pytest.mark.parametrize("code", [500, 503])
+def test_server_errors_are_retried(fake_openai, deadline_stream, code):
+    fake_openai.script.append(Status(code))
+
+    tokens = deadline_stream.stream(openai_factory(fake_openai))
+
+    assert text(tokens) == "Hello world"
+    assert fake_openai.requests == 2
+
+
+def test_retries_stop_at_max_retries(fake_openai, deadline_stream):
+    fake_openai.script.extend([Status(503)] * 5)
+
+    with pytest.raises(LLMUpstreamError):
+        list(deadline_stream.stream(openai_factory(fake_openai)))
+
+    assert fake_openai.requests == POLICY.max_retries + 1
+
+
+def test_a_failed_hedge_is_not_sent_again(fake_openai):
+    tracker = LatencyTracker()
+    for _ in range(POLICY.hedge_min_samples):
+        tracker.add(0.05)
+    policy = POLICY.model_copy(
+        update={"hedge": True, "max_retries": 0, "first_token_timeout": 2}
+    )
+    fake_openai.script.extend(
+        [Stream(stall_after=0, stall=1.0)] + [Status(500)] * 100
+    )
+
+    tokens = DeadlineStream(policy, tracker).stream(openai_factory(fake_openai))
+
+    assert text(tokens) == "Hello world"
+    assert fake_openai.requests == 2
@@ -0,0 +1,123 @@
+import json
+
+from src.models.agent import FormField
+from src.models.streaming import ToolCall, ToolCallFunction
+from src.utils import utils
+from src.utils.utils import (
+    create_dynamic_model,
+    create_repair_model,
+    format_validation_feedback,
+    get_canonical_tool,
+    validate_form_data,
+    validate_form_values,
+)
+
+FIELDS = [
+    FormField(name="Full name", type="Text", description="Legal name"),
+    FormField(name="Age", type="Whole number", description="Age in years"),
+    FormField(name="Middle name", type="Optional text", description="If any"),
+]
+
+
+def test_optional_fields_are_not_required():
+    model = create_dynamic_model(FIELDS)
+
+    result = validate_form_values({"full_name": "Ada", "age": 36}, model)
+
+    assert result.is_valid
+    assert result.data == {"full_name": "Ada", "age": 36, "middle_name": None}
+
+
+def test_valid_values_are_stored_coerced():
+    model = create_dynamic_model(FIELDS)
+
+    result = validate_form_values({"full_name": "Ada", "age": "36"}, model)
+
+    assert result.data["age"] == 36
+
+
+def test_missing_fields_are_not_repairable():
+    model = create_dynamic_model(FIELDS)
+
+    result = validate_form_values({"full_name": "Ada"}, model)
+
+    assert not result.is_valid
+    assert result.missing_fields == ["age"]
+    assert result.repairable_errors == []
+
+
+def test_only_submitted_invalid_values_are_repaired():
+    model = create_dynamic_model(FIELDS)
+
+    result = validate_form_values({"age": "thirty"}, model)
+
+    assert [error.field for error in result.repairable_errors] == ["age"]
+    assert result.missing_fields == ["full_name"]
+    repair_model = create_repair_model("agent-1", FIELDS, ["age"])
+    assert list(repair_model.model_fields) == ["age"]
+
+
+def test_feedback_asks_the_user_for_missing_fields():
+    model = create_dynamic_model(FIELDS)
+    result = validate_form_values({"age": "thirty"}, model)
+
+    feedback = format_validation_feedback(result)
+
+    assert "- age: got 'thirty'" in feedback
+    assert "full_name" in feedback
+    assert "Ask the user" in feedback
+
+
+def test_invalid_json_arguments_are_reported():
+    model = create_dynamic_model(FIELDS)
+    tool_call = ToolCall(
+        id="call_1",
+        function=ToolCallFunction(name=model.__name__, arguments='{"full_name": '),
+    )
+
+    result = validate_form_data([tool_call], model)
+
+    assert result.submitted and not result.is_valid
+    assert "couldn't be read" in format_validation_feedback(result)
+
+
+def test_submission_round_trips_through_json():
+    model = create_dynamic_model(FIELDS)
+    tool_call = ToolCall(
+        id="call_1",
+        function=ToolCallFunction(
+            name=model.__name__, arguments=json.dumps({"full_name": "Ada", "age": 36})
+        ),
+    )
+
+    assert validate_form_data([tool_call], model).is_valid
+
+
+def test_repair_models_and_their_tools_are_reused():
+    first = create_repair_model("agent-1", FIELDS, ["age"])
+    second = create_repair_model("agent-1", FIELDS, ["age"])
+
+    assert first is second
+    assert get_canonical_tool(first) is get_canonical_tool(second)
+
+
+def test_tool_cache_is_keyed_by_fields():
+    for _ in range(3):
+        get_canonical_tool(create_repair_model("agent-1", FIELDS, ["age"]))
+
+    assert len(utils._TOOL_CACHE) == 1
+
+
+def test_edited_examples_get_a_new_model():
+    edited = [
+        FIELDS[0].model_copy(update={"example": "Grace Hopper"}),
+        *FIELDS[1:],
+    ]
+
+    before = utils._get_cached_model("agent-1", FIELDS)
+    after = utils._get_cached_model("agent-1", edited)
+
+    assert before is not after
+    schema = get_canonical_tool(after)["function"]["parameters"]
+    assert "Grace Hopper" in str(schema)
+    assert utils._get_cached_model("agent-1", FIELDS) is before
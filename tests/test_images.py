@@ -0,0 +1,170 @@
+import io
+
+import pytest
+from PIL import Image
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.shared_cache import shared_cache
+from src.models.message import Message, MessageContent, MessageContentTypes, Roles
+from src.utils.images import (
+    ImageError,
+    ImagePayloadCache,
+    encode_image,
+    get_image_bytes,
+    image_payloads,
+    resolve_images,
+    serialize_message,
+    to_prompt_message,
+)
+from src.utils.constants import MetricNames
+
+
+def photo(width: int, height: int, fmt: str = "JPEG") -> io.BytesIO:
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    upload = io.BytesIO()
+    image.save(upload, fmt)
+    upload.seek(0)
+    return upload
+
+
+def image_message(ref: str) -> Message:
+    return Message(
+        role=Roles.USER,
+        content=[
+            MessageContent(type=MessageContentTypes.TEXT, text="My ID"),
+            MessageContent(type=MessageContentTypes.IMAGE, image_ref=ref),
+        ],
+    )
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_large_images_are_downscaled_to_jpeg(fmt):
+    ref = encode_image(photo(4000, 3000, fmt))
+
+    with Image.open(io.BytesIO(get_image_bytes(ref))) as image:
+        assert image.format == "JPEG"
+        assert max(image.size) == settings.IMAGE_MAX_SIDE
+
+
+def test_same_content_is_encoded_once():
+    first = encode_image(photo(800, 600))
+    hits = metrics.get(MetricNames.IMAGE_CACHE_HITS)
+    second = encode_image(photo(800, 600))
+
+    assert first == second
+    assert metrics.get(MetricNames.IMAGE_CACHE_HITS) == hits + 1
+
+
+def test_payloads_are_never_written_to_disk():
+    encode_image(photo(800, 600))
+
+    rows = shared_cache._conn.execute(
+        "SELECT COUNT(*) FROM entries WHERE key GLOB 'image:*'"
+    ).fetchone()
+    assert rows == (0,)
+
+
+def test_unreadable_uploads_raise_image_error():
+    with pytest.raises(ImageError):
+        encode_image(io.BytesIO(b"not an image at all"))
+
+
+def test_truncated_uploads_raise_image_error():
+    data = photo(800, 600).getvalue()
+
+    with pytest.raises(ImageError):
+        encode_image(io.BytesIO(data[: len(data) // 2]))
+
+
+def test_decompression_bombs_raise_image_error(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100 * 100)
+
+    with pytest.raises(ImageError):
+        encode_image(photo(150, 150, "PNG"))
+
+
+def test_serialized_messages_keep_references():
+    ref = encode_image(photo(800, 600))
+
+    data = serialize_message(image_message(ref), exclude_none=True)
+
+    assert data["content"][1] == {"type": MessageContentTypes.IMAGE, "image_ref": ref}
+    resolved = resolve_images(data)
+    assert resolved["content"][1]["image_url"]["url"].startswith("data:image/jpeg")
+    assert data["content"][1]["image_ref"] == ref
+
+
+def test_text_messages_are_not_copied():
+    data = serialize_message(
+        Message(
+            role=Roles.USER,
+            content=[MessageContent(type=MessageContentTypes.TEXT, text="Hi")],
+        )
+    )
+
+    assert resolve_images(data) is data
+    assert data["content"][0] == {"type": MessageContentTypes.TEXT, "text": "Hi"}
+
+
+def test_discarded_payloads_become_placeholders():
+    ref = encode_image(photo(800, 600))
+    image_payloads.discard([ref])
+
+    data = to_prompt_message(image_message(ref))
+
+    assert data["content"][1]["type"] == MessageContentTypes.TEXT
+    assert "no longer available" in data["content"][1]["text"]
+
+
+def test_clearing_one_session_keeps_the_image_for_others():
+    ref = encode_image(photo(800, 600), session_id="session-a")
+    assert encode_image(photo(800, 600), session_id="session-b") == ref
+
+    image_payloads.discard([ref], "session-a")
+
+    assert get_image_bytes(ref) is not None
+    image_payloads.discard([ref], "session-b")
+    assert get_image_bytes(ref) is None
+    assert image_payloads._size == 0
+
+def test_payload_cache_is_bounded_by_size():
+    cache = ImagePayloadCache(max_bytes=10)
+    cache.put("a", "x" * 6)
+    cache.put("b", "y" * 6)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    cache.discard(["b"])
+    assert cache.get("b") is None and cache._size == 0
+
+
+def test_exif_orientation_is_applied():
+    image = Image.new("RGB", (200, 100))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    upload = io.BytesIO()
+    image.save(upload, "JPEG", exif=exif)
+
+    ref = encode_image(upload)
+
+    with Image.open(io.BytesIO(get_image_bytes(ref))) as encoded:
+        assert encoded.size == (100, 200)
+
+
+def test_session_history_keeps_references_not_payloads():
+    import streamlit as st
+
+    from src.pages.chat import ChatApp
+    from src.utils.constants import StateVariables
+
+    ref = encode_image(photo(800, 600))
+    st.session_state[StateVariables.SERIALIZED_HISTORY] = []
+    try:
+        history = ChatApp.serialize_history([image_message(ref)])
+        stored = st.session_state[StateVariables.SERIALIZED_HISTORY]
+    finally:
+        del st.session_state[StateVariables.SERIALIZED_HISTORY]
+
+    assert "data:image" not in str(stored)
+    assert history[0]["content"][1]["image_url"]["url"].startswith("data:image")
@@ -0,0 +1,76 @@
+import logging
+
+from src.core.profiling import TurnProfiler
+
+
+def profile(profiler, turns, agent_id="agent-1"):
+    for turn in range(1, turns + 1):
+        with profiler.profile_turn(agent_id, turn):
+            sum(range(1000))
+
+
+def test_turns_are_not_profiled_at_rate_zero(tmp_path):
+    profile(TurnProfiler(0, str(tmp_path / "profiles"), 10), 5)
+
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_every_turn_is_profiled_at_rate_one(tmp_path):
+    profile(TurnProfiler(1, str(tmp_path), 10), 3)
+
+    assert len(list(tmp_path.glob("*.txt"))) == 3
+    assert len(list(tmp_path.glob("*.prof"))) == 3
+
+
+def test_reports_are_named_after_the_agent_and_turn(tmp_path):
+    profiler = TurnProfiler(1, str(tmp_path), 10)
+
+    with profiler.profile_turn("intake-agent", 7):
+        pass
+
+    (report,) = tmp_path.glob("*.txt")
+    assert report.name.startswith("intake-agent-turn0007-")
+    assert report.with_suffix(".prof").exists()
+    assert "agent: intake-agent" in report.read_text()
+
+
+def test_reports_are_rotated_to_max_files(tmp_path):
+    profile(TurnProfiler(1, str(tmp_path), 2), 5)
+
+    assert len(list(tmp_path.glob("*.txt"))) == 2
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+
+
+def test_sections_are_timed_inside_sampled_turns(tmp_path):
+    profiler = TurnProfiler(1, str(tmp_path), 10)
+    timed = profiler.section("build_prompt")(lambda: "prompt")
+
+    with profiler.profile_turn("agent-1", 1):
+        assert timed() == "prompt"
+
+    (report,) = tmp_path.glob("*.txt")
+    assert "section build_prompt:" in report.read_text()
+
+
+def test_sections_are_a_no_op_outside_sampled_turns(tmp_path):
+    profiler = TurnProfiler(0, str(tmp_path), 10)
+    timed = profiler.section("build_prompt")(lambda: "prompt")
+
+    assert timed() == "prompt"
+    with profiler.profile_turn("agent-1", 1):
+        assert timed() == "prompt"
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_unwritable_output_dir_does_not_fail_the_turn(tmp_path, caplog):
+    blocker = tmp_path / "profiles"
+    blocker.write_text("not a directory")
+    profiler = TurnProfiler(1, str(blocker), 10)
+
+    with caplog.at_level(logging.WARNING):
+        with profiler.profile_turn("agent-1", 1):
+            result = "answered"
+
+    assert result == "answered"
+    assert "Couldn't write the profile of turn 1" in caplog.text
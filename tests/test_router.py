@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+
+import pytest
+from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
+
+from src.core.router import ModelRouter, closing_question, signals_for_turn
+from src.models.form import FieldError, FormValidationResult
+from src.models.message import Message, MessageContent, MessageContentTypes, Roles
+from src.models.routing import RoutingRules
+from src.streaming.message_builder import StreamMessageBuilder
+from src.streaming.processor import StreamProcessor
+
+REPLAYS = Path(__file__).parent / "fixtures" / "routing_replays.jsonl"
+
+
+def load_replays() -> list[dict]:
+    with REPLAYS.open() as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(chunks: list[dict]) -> list[Message]:
+    """Rebuilds the history a recorded stream leaves behind, as the chat page does."""
+
+    stream = (
+        {"raw_response": ChatCompletionChunk.model_validate(chunk)} for chunk in chunks
+    )
+    result = StreamProcessor().process_stream(stream)
+    user = Message(
+        role=Roles.USER,
+        content=[MessageContent(type=MessageContentTypes.TEXT, text="Hi")],
+    )
+    return [user, *StreamMessageBuilder.build_messages(result)]
+
+
+@pytest.mark.parametrize("case", load_replays(), ids=lambda case: case["name"])
+def test_replayed_streams_route_as_expected(case):
+    rules = RoutingRules()
+    router = ModelRouter(rules)
+
+    decision = router.route(
+        signals_for_turn(rules, replay(case["chunks"])), rules.default_model
+    )
+
+    assert decision.reason == case["expected_reason"]
+
+
+def test_most_replayed_turns_stay_on_the_cheap_model():
+    rules = RoutingRules()
+    router = ModelRouter(rules)
+    decisions = [
+        router.route(signals_for_turn(rules, replay(case["chunks"])), "")
+        for case in load_replays()
+    ]
+
+    escalated = [d for d in decisions if d.model == rules.strong_model]
+    assert len(escalated) < len(decisions) / 2
+
+
+def test_validation_failures_escalate_but_missing_fields_are_counted():
+    rules = RoutingRules(ambiguous_missing_fields=0)
+    validation = FormValidationResult(
+        submitted=True,
+        data={"age": "thirty"},
+        errors=[
+            FieldError(field="age", type="int_parsing", message="not a number"),
+            FieldError(field="name", type="missing", message="Field required"),
+        ],
+    )
+
+    signals = signals_for_turn(rules, [], validation)
+
+    assert signals.validation_failed
+    assert signals.missing_fields == 1
+    assert ModelRouter(rules).route(signals, "").reason == "validation_failure"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("All set. Is this correct?", "is this correct?"),
+        ("Is this correct? Thanks.", ""),
+        ("Name: Ada\nShall I submit?", "shall i submit?"),
+    ],
+)
+def test_closing_question(text, expected):
+    assert closing_question(text) == expected
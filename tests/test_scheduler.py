@@ -0,0 +1,216 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import ValidationError
+
+from src.core.config import Config
+from src.streaming.deadline import (
+    DeadlinePolicy,
+    DeadlineStream,
+    LatencyTracker,
+    LLMUpstreamError,
+)
+from src.streaming.scheduler import LLMAdmissionError, LLMScheduler, TokenBucket
+from tests.fake_openai import Status, Stream
+
+POLICY = DeadlinePolicy(
+    first_token_timeout=2,
+    stall_timeout=2,
+    total_deadline=10,
+    max_retries=2,
+    retry_backoff=0.001,
+)
+
+
+def call(server, scheduler, session="s1", policy=POLICY, tracker=None) -> str:
+    client = server.client()
+    deadline_stream = DeadlineStream(policy, tracker or LatencyTracker())
+    with scheduler.slot("sk-test", session, "agent") as admission:
+        tokens = deadline_stream.stream(
+            lambda: client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": "hi"}],
+                stream=True,
+            ),
+            admission,
+        )
+        return "".join(
+            chunk.choices[0].delta.content or "" for chunk in tokens if chunk.choices
+        )
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"LLM_RATE_LIMIT_PER_SECOND": 0},
+        {"LLM_RATE_LIMIT_PER_SECOND": -1},
+        {"LLM_RATE_LIMIT_BURST": 0.5},
+        {"LLM_MAX_CONCURRENCY_PER_KEY": 0},
+    ],
+)
+def test_invalid_limits_are_rejected(overrides):
+    with pytest.raises(ValidationError):
+        Config(PROMPTLAYER_API_KEY="test", **overrides)
+
+
+def test_token_bucket_requires_a_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=5)
+
+
+def test_retries_take_a_token(fake_openai):
+    scheduler = LLMScheduler(4, rate_per_second=4, burst=1, max_queue_wait=5)
+    fake_openai.script.append(Status(503))
+    started = time.monotonic()
+
+    assert call(fake_openai, scheduler) == "Hello world"
+
+    assert fake_openai.requests == 2
+    assert time.monotonic() - started >= 0.2
+
+
+def test_retry_after_holds_back_the_whole_key(fake_openai):
+    scheduler = LLMScheduler(4, rate_per_second=100, burst=10, max_queue_wait=5)
+    fake_openai.script.append(Status(429, retry_after=0.4))
+    started = time.monotonic()
+
+    assert call(fake_openai, scheduler) == "Hello world"
+    assert time.monotonic() - started >= 0.4
+
+    fake_openai.script.append(Status(429, retry_after=0.4))
+    blocked = threading.Thread(target=call, args=(fake_openai, scheduler))
+    blocked.start()
+    time.sleep(0.1)
+    other_started = time.monotonic()
+    assert call(fake_openai, scheduler, session="s2") == "Hello world"
+    assert time.monotonic() - other_started >= 0.2
+    blocked.join()
+
+
+def test_exhausted_quota_is_not_retried(fake_openai):
+    scheduler = LLMScheduler(4, rate_per_second=100, burst=10, max_queue_wait=5)
+    fake_openai.script.append(Status(429, error_code="insufficient_quota"))
+
+    with pytest.raises(LLMUpstreamError):
+        call(fake_openai, scheduler)
+
+    assert fake_openai.requests == 1
+
+
+def test_retries_fail_when_no_token_frees_up_in_time(fake_openai):
+    scheduler = LLMScheduler(4, rate_per_second=0.1, burst=1, max_queue_wait=0.2)
+    fake_openai.script.append(Status(503))
+
+    with pytest.raises(LLMAdmissionError):
+        call(fake_openai, scheduler)
+
+    assert fake_openai.requests == 1
+
+
+@pytest.mark.parametrize("burst, expected_requests", [(1, 1), (2, 2)])
+def test_hedges_take_a_token(fake_openai, burst, expected_requests):
+    scheduler = LLMScheduler(4, rate_per_second=0.01, burst=burst, max_queue_wait=5)
+    tracker = LatencyTracker()
+    for _ in range(POLICY.hedge_min_samples):
+        tracker.add(0.05)
+    fake_openai.script.append(Stream(stall_after=0, stall=0.5))
+    policy = POLICY.model_copy(update={"hedge": True})
+
+    assert call(fake_openai, scheduler, policy=policy, tracker=tracker)
+
+    assert fake_openai.requests == expected_requests
+
+
+def test_load_respects_the_rate_and_concurrency_limits(fake_openai):
+    """30 calls from 6 sessions against a backend whose first responses fail."""
+
+    rate, burst, concurrency = 20, 5, 3
+    scheduler = LLMScheduler(concurrency, rate, burst, max_queue_wait=10)
+    fake_openai.script.extend([Status(503), Status(500)] * 3)
+    policy = POLICY.model_copy(update={"max_retries": 6})
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=30) as executor:
+        results = list(
+            executor.map(
+                lambda idx: call(
+                    fake_openai, scheduler, session=f"s{idx % 6}", policy=policy
+                ),
+                range(30),
+            )
+        )
+
+    assert results == ["Hello world"] * 30
+    assert fake_openai.requests == 36
+    assert fake_openai.max_active <= concurrency
+    for count, sent_at in enumerate(sorted(fake_openai.request_times), start=1):
+        assert count <= burst + rate * (sent_at - started)
+
+
+def test_flows_are_served_round_robin():
+    scheduler = LLMScheduler(1, rate_per_second=1000, burst=1000, max_queue_wait=5)
+    order = []
+    gate = threading.Event()
+
+    def hold():
+        with scheduler.slot("sk-test", "holder", "agent"):
+            gate.wait()
+
+    def run(session):
+        with scheduler.slot("sk-test", session, "agent"):
+            order.append(session)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.05)
+    threads = [threading.Thread(target=run, args=("busy",)) for _ in range(5)]
+    threads.append(threading.Thread(target=run, args=("quiet",)))
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    gate.set()
+    for thread in [holder, *threads]:
+        thread.join()
+
+    assert order.index("quiet") <= 1
+
+
+def test_retries_and_hedges_wait_their_turn_behind_other_flows():
+    """A session whose calls keep retrying and hedging doesn't starve another."""
+
+    scheduler = LLMScheduler(16, rate_per_second=10, burst=1, max_queue_wait=2)
+    retrying, hedging = 8, 3
+    started = threading.Barrier(retrying + hedging + 1)
+    quiet_done = threading.Event()
+
+    def busy(retry: bool):
+        with scheduler.slot("sk-test", "busy", "agent") as admission:
+            started.wait()
+            while not quiet_done.is_set():
+                if retry:
+                    admission.acquire(2)
+                else:
+                    admission.try_acquire()
+                    time.sleep(0.001)
+
+    threads = [
+        threading.Thread(target=busy, args=(idx < retrying,))
+        for idx in range(retrying + hedging)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    time.sleep(0.05)
+    waits = []
+    try:
+        for _ in range(3):
+            with scheduler.slot("sk-test", "quiet", "agent") as admission:
+                waits.append(admission.wait)
+    finally:
+        quiet_done.set()
+        for thread in threads:
+            thread.join()
+
+    assert max(waits) < 0.3
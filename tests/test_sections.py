@@ -0,0 +1,144 @@
+import pytest
+import streamlit as st
+
+from src.core.config import settings
+from src.models.agent import FormSection
+from src.pages.chat import ChatApp
+from src.utils import constants as c
+from src.utils.utils import (
+    get_canonical_tool,
+    get_form_model,
+    get_section_model,
+    model_fields_to_string,
+    resolve_sections,
+    validate_form_values,
+)
+
+SECTION_A = {"field_0": "a", "field_1": 1, "field_2": "c"}
+SECTION_B = {"field_3": "d", "field_4": 4, "field_5": "f"}
+
+
+@pytest.fixture
+def sectioned(make_agent, monkeypatch):
+    monkeypatch.setattr(settings, "FORM_REPAIR_MAX_ATTEMPTS", 0)
+    st.session_state.clear()
+    st.session_state[c.StateVariables.CONVERSATION_HISTORY] = []
+    st.session_state[c.StateVariables.FORM_DATA] = {}
+    st.session_state[c.StateVariables.LAST_VALIDATION] = None
+    st.session_state[c.StateVariables.CURRENT_SECTION] = 0
+    agent = make_agent(
+        6,
+        sections=[
+            FormSection(name="A", fields=["Field 0", "Field 1", "Field 2"]),
+            FormSection(name="B", fields=["Field 3", "Field 4", "Field 5"]),
+        ],
+    )
+    yield ChatApp.__new__(ChatApp), agent, resolve_sections(agent, 40, 20)
+    st.session_state.clear()
+
+
+def section_validation(agent, section, data):
+    return validate_form_values(data, get_section_model(agent, section))
+
+
+def state(name):
+    return st.session_state[name]
+
+
+def prompt_chars(form) -> int:
+    return len(model_fields_to_string(form)) + len(str(get_canonical_tool(form)))
+
+
+def test_large_forms_are_chunked(make_agent):
+    agent = make_agent(300)
+
+    sections = resolve_sections(agent, auto_chunk_threshold=40, chunk_size=20)
+
+    assert len(sections) == 15
+    assert sum(len(section.fields) for section in sections) == 300
+
+
+def test_small_forms_are_not_sectioned(make_agent):
+    sections = resolve_sections(make_agent(10), auto_chunk_threshold=40, chunk_size=20)
+
+    assert sections == []
+
+
+def test_section_prompt_is_a_fraction_of_the_full_form(make_agent):
+    agent = make_agent(300)
+    sections = resolve_sections(agent, auto_chunk_threshold=40, chunk_size=20)
+
+    full = prompt_chars(get_form_model(agent))
+    section = prompt_chars(get_section_model(agent, sections[0]))
+
+    assert section * 10 < full
+
+
+def test_sections_are_merged_until_the_form_is_complete(sectioned):
+    app, agent, sections = sectioned
+
+    first = app.complete_section(
+        agent, sections, section_validation(agent, sections[0], SECTION_A), "call-1"
+    )
+
+    assert first is None
+    assert state(c.StateVariables.CURRENT_SECTION) == 1
+    assert state(c.StateVariables.FORM_DATA) == SECTION_A
+    assert "Continue with section 'B'" in str(
+        state(c.StateVariables.CONVERSATION_HISTORY)[-1].content
+    )
+
+    merged = app.complete_section(
+        agent, sections, section_validation(agent, sections[1], SECTION_B), "call-2"
+    )
+
+    assert merged.is_valid
+    assert merged.data == {**SECTION_A, **SECTION_B}
+
+
+def test_failed_merge_sends_back_to_the_failing_section(sectioned):
+    app, agent, sections = sectioned
+    st.session_state[c.StateVariables.CURRENT_SECTION] = 1
+    form_data = {**SECTION_A, "field_1": "one", **SECTION_B}
+    validation = validate_form_values(form_data, get_form_model(agent))
+
+    result = app.repair_full_form(agent, sections, validation, {})
+
+    assert result.failing_fields == ["field_1"]
+    assert state(c.StateVariables.CURRENT_SECTION) == 0
+    assert state(c.StateVariables.LAST_VALIDATION) is result
+
+
+def test_fixed_section_submits_without_collecting_later_sections(sectioned):
+    app, agent, sections = sectioned
+    st.session_state[c.StateVariables.FORM_DATA] = {
+        **SECTION_A,
+        "field_1": "one",
+        **SECTION_B,
+    }
+
+    merged = app.complete_section(
+        agent, sections, section_validation(agent, sections[0], SECTION_A), "call-3"
+    )
+
+    assert merged.is_valid
+    assert merged.data == {**SECTION_A, **SECTION_B}
+    assert state(c.StateVariables.CURRENT_SECTION) == 0
+
+
+def test_fixed_section_moves_to_the_next_failing_section(sectioned):
+    app, agent, sections = sectioned
+    st.session_state[c.StateVariables.FORM_DATA] = {
+        **SECTION_A,
+        "field_1": "one",
+        **SECTION_B,
+        "field_4": "four",
+    }
+
+    merged = app.complete_section(
+        agent, sections, section_validation(agent, sections[0], SECTION_A), "call-4"
+    )
+    result = app.repair_full_form(agent, sections, merged, {})
+
+    assert result.failing_fields == ["field_4"]
+    assert state(c.StateVariables.CURRENT_SECTION) == 1
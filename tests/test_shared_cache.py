@@ -0,0 +1,98 @@
+import json
+import sys
+import threading
+
+from src.core.shared_cache import SharedCache, shared_cache
+from src.utils import utils
+from src.utils.utils import AGENT_KEY_PREFIX, load_agents, save_agents
+
+
+def agent_keys() -> set[str]:
+    rows = shared_cache._conn.execute(
+        "SELECT key FROM entries WHERE key GLOB ?", (f"{AGENT_KEY_PREFIX}*",)
+    ).fetchall()
+    return {key for (key,) in rows}
+
+
+def test_set_many_prunes_only_the_prefix(isolated_storage):
+    cache = SharedCache(str(isolated_storage / "prune.sqlite3"))
+    cache.set_many({"agent:a": "1", "agent:b": "2", "tool:x": "3"})
+
+    cache.set_many({"agent:b": "2", "agent:c": "4"}, prune_prefix="agent:")
+
+    assert cache.get_many(["agent:a", "agent:b", "agent:c", "tool:x"]) == {
+        "agent:b": "2",
+        "agent:c": "4",
+        "tool:x": "3",
+    }
+
+
+def test_edited_and_removed_agents_are_garbage_collected(make_agent):
+    agents = [make_agent(id=f"agent-{idx}").model_dump() for idx in range(3)]
+    save_agents(agents)
+    load_agents()
+    assert len(agent_keys()) == 3
+
+    agents[0]["name"] = "Renamed"
+    save_agents([agents[0]], replace=True)
+    with open(utils.AGENT_DB_FILE, "w") as f:
+        json.dump(agents[:2], f)
+    loaded = load_agents()
+
+    assert [agent.name for agent in loaded] == ["Renamed", "Test agent"]
+    assert len(agent_keys()) == 2
+    assert set(utils._agent_objects) == agent_keys()
+
+
+def test_a_worker_with_stale_objects_drops_them(make_agent):
+    agents = [make_agent(id=f"agent-{idx}").model_dump() for idx in range(2)]
+    save_agents(agents)
+    load_agents()
+    stale = dict(utils._agent_objects)
+
+    save_agents([{**agents[1], "goal": "Something else"}], replace=True)
+    utils._agent_catalog = None
+    utils._agent_objects.update(stale)
+    loaded = load_agents()
+
+    assert [agent.goal for agent in loaded][1] == "Something else"
+    assert set(utils._agent_objects) == agent_keys()
+
+
+def test_concurrent_saves_and_loads_see_a_consistent_catalog(make_agent):
+    agents = [make_agent(id=f"agent-{idx}").model_dump() for idx in range(3)]
+    save_agents(agents)
+    errors = []
+
+    def save(worker: int):
+        try:
+            for round in range(100):
+                goal = f"Goal {worker}-{round}"
+                save_agents([{**agents[worker], "goal": goal}], replace=True)
+        except Exception as e:
+            errors.append(e)
+
+    def load():
+        try:
+            for _ in range(200):
+                utils._agent_catalog = None
+                assert len(load_agents()) == 3
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(idx,)) for idx in range(3)]
+    threads += [threading.Thread(target=load) for _ in range(3)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    utils._agent_catalog = None
+    load_agents()
+    assert errors == []
+    assert set(utils._agent_objects) == agent_keys()
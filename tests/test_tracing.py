@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from src.core.metrics import metrics
+from src.core.tracing import Span, SpanExporter, TraceSampler, Tracer
+from src.utils.constants import MetricNames
+
+
+def exporter_for(collector, **overrides) -> SpanExporter:
+    options = {"queue_size": 10, "batch_size": 50, "flush_interval": 0.05}
+    return SpanExporter(collector.url, "test-key", **{**options, **overrides})
+
+
+def wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def finished_span(seconds: float, error: str | None = None) -> Span:
+    span = Span(name="intake_turn", trace_id="trace", error=error)
+    span.end_time = span.start_time + int(seconds * 1e9)
+    return span
+
+
+def test_sampler_keeps_errors_and_slow_turns_at_rate_zero():
+    sampler = TraceSampler(rate=0, slow_seconds=10)
+    fast = finished_span(0.1)
+    failed = finished_span(0.1, error="LLMTimeoutError()")
+    slow = finished_span(12)
+
+    assert not sampler.should_export(fast, [fast])
+    assert sampler.should_export(fast, [fast, failed])
+    assert sampler.should_export(slow, [slow])
+    assert TraceSampler(rate=1, slow_seconds=10).should_export(fast, [fast])
+
+
+def test_spans_share_the_trace_and_point_at_their_parent(collector):
+    tracer = Tracer(TraceSampler(1, 10), exporter_for(collector))
+
+    with tracer.span("intake_turn", turn=1) as root:
+        with tracer.span("llm_call") as child:
+            with tracer.span("stream") as grandchild:
+                pass
+    with tracer.span("intake_turn", turn=2) as other:
+        pass
+
+    assert root.parent_id is None
+    assert child.trace_id == grandchild.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert grandchild.parent_id == child.span_id
+    assert other.parent_id is None
+    assert other.trace_id != root.trace_id
+
+
+def test_sampled_out_traces_are_not_exported(collector):
+    tracer = Tracer(TraceSampler(0, 10), exporter_for(collector))
+    sampled_out = metrics.get(MetricNames.TRACE_SPANS_SAMPLED_OUT)
+
+    with tracer.span("intake_turn"):
+        with tracer.span("llm_call"):
+            pass
+
+    assert metrics.get(MetricNames.TRACE_SPANS_SAMPLED_OUT) == sampled_out + 2
+    assert collector.payloads == []
+
+
+def test_exported_payload_matches_spans_bulk(collector):
+    tracer = Tracer(TraceSampler(0, 10), exporter_for(collector))
+
+    with pytest.raises(ValueError):
+        with tracer.span("intake_turn", agent_id="agent-1") as root:
+            with tracer.span("llm_call", model="gpt-4o-mini"):
+                raise ValueError("bad field")
+
+    collector.received.wait(2)
+    (payload,) = collector.payloads
+    assert collector.headers[0]["X-API-KEY"] == "test-key"
+    assert collector.headers[0]["Content-Type"] == "application/json"
+    assert list(payload) == ["spans"]
+    child, exported_root = payload["spans"]
+    assert exported_root == {
+        "name": "intake_turn",
+        "context": {"trace_id": root.trace_id, "span_id": root.span_id},
+        "parent_id": None,
+        "kind": "SpanKind.INTERNAL",
+        "start_time": root.start_time,
+        "end_time": root.end_time,
+        "status": {"status_code": "ERROR", "description": "ValueError('bad field')"},
+        "attributes": {"agent_id": "agent-1"},
+        "events": [],
+        "links": [],
+        "resource": {"attributes": {"service.name": "intake-agent"}},
+    }
+    assert child["name"] == "llm_call"
+    assert child["parent_id"] == root.span_id
+    assert child["context"]["trace_id"] == root.trace_id
+    assert child["attributes"] == {"model": "gpt-4o-mini"}
+
+
+def test_exporter_batches_traces_up_to_the_batch_size(collector):
+    exporter = exporter_for(collector, batch_size=4, flush_interval=0.5)
+    exported = metrics.get(MetricNames.TRACE_SPANS_EXPORTED)
+
+    for trace in range(3):
+        exporter.submit([{"name": f"span-{trace}-{idx}"} for idx in range(2)])
+    wait_until(lambda: len(collector.spans) == 6)
+
+    assert [len(payload["spans"]) for payload in collector.payloads] == [4, 2]
+    wait_until(lambda: metrics.get(MetricNames.TRACE_SPANS_EXPORTED) == exported + 6)
+
+
+def test_exporter_drops_traces_when_its_queue_is_full(collector):
+    collector.hold = True
+    exporter = exporter_for(collector, queue_size=1)
+    dropped = metrics.get(MetricNames.TRACE_SPANS_DROPPED)
+
+    exporter.submit([{"name": "exporting"}])
+    assert collector.received.wait(2)
+    exporter.submit([{"name": "queued"}])
+    exporter.submit([{"name": "dropped"}, {"name": "dropped"}])
+
+    assert metrics.get(MetricNames.TRACE_SPANS_DROPPED) == dropped + 2
+    collector.release.set()
+    wait_until(lambda: len(collector.spans) == 2)
+    assert [span["name"] for span in collector.spans] == ["exporting", "queued"]
+
+
+def test_export_errors_are_counted(collector):
+    collector.status = 500
+    exporter = exporter_for(collector)
+    errors = metrics.get(MetricNames.TRACE_EXPORT_ERRORS)
+    exported = metrics.get(MetricNames.TRACE_SPANS_EXPORTED)
+
+    exporter.submit([{"name": "lost"}])
+
+    wait_until(lambda: metrics.get(MetricNames.TRACE_EXPORT_ERRORS) == errors + 1)
+    assert metrics.get(MetricNames.TRACE_SPANS_EXPORTED) == exported